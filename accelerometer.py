@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import math
+
+# accelerometer calibration and tilt: the 10 bit raw values are converted to g with the factory
+# calibration stored in the EEPROM of each remote, tilt is taken from a low-pass filtered gravity
+# vector (stable enough to point or scroll with, without MotionPlus)
+# signs follow MotionPlus: positive pitch = nose up, positive roll = left side down
+class Accelerometer:
+	CALIBRATION_ADDRESS = 0x0016 # EEPROM: zero x/y/z, LSBs, 1 g x/y/z, LSBs, unused, checksum
+	CALIBRATION_SIZE    = 10
+	ZERO  = 0x200 # nominal 10 bit values, used until the calibration was read
+	ONE_G = 0x68
+	SMOOTHING = 0.15 # weight of a new report in the filtered gravity vector
+
+	def __init__(self):
+		self.zero = [self.ZERO] * 3
+		self.scale = [1.0 / self.ONE_G] * 3
+		self.calibrated = False
+		# filtered gravity vector in g
+		self.x = 0.0
+		self.y = 0.0
+		self.z = 1.0
+
+	def setCalibration(self, data):
+		# data: CALIBRATION_SIZE bytes read from CALIBRATION_ADDRESS, None if the read failed
+		if(data is None or len(data) < self.CALIBRATION_SIZE):
+			return False
+		if((sum(data[:9]) + 0x55) & 0xff != data[9]):
+			print('Invalid accelerometer calibration (checksum), using nominal values')
+			return False
+		zero = [(data[0] << 2) | ((data[3] >> 4) & 0x03), (data[1] << 2) | ((data[3] >> 2) & 0x03), (data[2] << 2) | (data[3] & 0x03)]
+		oneG = [(data[4] << 2) | ((data[7] >> 4) & 0x03), (data[5] << 2) | ((data[7] >> 2) & 0x03), (data[6] << 2) | (data[7] & 0x03)]
+		if(any(g <= z for g, z in zip(oneG, zero))):
+			print('Invalid accelerometer calibration, using nominal values')
+			return False
+		self.zero = zero
+		self.scale = [1.0 / (g - z) for g, z in zip(oneG, zero)]
+		self.calibrated = True
+		return True
+
+	def update(self, s):
+		# s: State with 10 bit accel values, gets the values in g
+		zero = self.zero
+		scale = self.scale
+		s.gx = (s.x10 - zero[0]) * scale[0]
+		s.gy = (s.y10 - zero[1]) * scale[1]
+		s.gz = (s.z10 - zero[2]) * scale[2]
+		w = self.SMOOTHING
+		self.x += (s.gx - self.x) * w
+		self.y += (s.gy - self.y) * w
+		self.z += (s.gz - self.z) * w
+
+	def tilt(self):
+		# (pitch, roll) in degrees of the filtered gravity vector
+		x = self.x; y = self.y; z = self.z
+		return math.degrees(math.atan2(y, math.sqrt(x*x + z*z))), math.degrees(math.atan2(x, z))
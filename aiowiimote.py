@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import asyncio
+import time
+
+import wiimote
+import hidraw
+
+# asyncio interface for a Wiimote: the hidraw device is read non-blocking from the event loop
+# (no reader/dispatcher threads), reports are handled by the same code as in the threaded mode
+#
+#   controller = AsyncController()
+#   await controller.start(1920, 1080)
+#   async for event, value in controller:
+#       ...
+#
+# events: ('state', State copy), ('status', battery percent), ('laserPointer', (visible, x, y) in screen coordinates),
+#         ('calibration', recognized points); the iteration ends when the remote disconnects
+class AsyncController:
+	# max. number of queued events; if the consumer is slower, state events are skipped
+	MAX_QUEUE = 256
+
+	def __init__(self, path=None, playerIndex=0):
+		self.controller = wiimote.Controller(path, playerIndex)
+		self.dev = None
+		self.queue = asyncio.Queue()
+		self.yieldStates = True
+		self.closed = False
+		# output reports are sent from the event loop as well, instead of the writer thread
+		self.controller.writerThread = False
+		self.pumpHandle = None
+
+	async def start(self, screenWidth, screenHeight):
+		path = self.controller.path
+		if(not path):
+			devices = hidraw.enumerate(wiimote.IDs)
+			if(not devices):
+				raise Exception('Unable to find a Wiimote HID device')
+			path = devices[0]['path']
+			self.controller.path = path
+		self.dev = hidraw.HidrawDevice(path, nonBlocking=True)
+		print(f'Connected to: {self.dev.product}, Serial: {self.dev.serial}')
+
+		c = self.controller
+		c.evtStatusReport.connect(lambda battery: self.__put('status', battery))
+		c.evtLaserPointer.connect(lambda visible, x, y: self.__put('laserPointer', (visible, x, y)))
+		c.evtCalibrationChanged.connect(lambda points: self.__put('calibration', points))
+		c.open(screenWidth, screenHeight, self.dev)
+		asyncio.get_running_loop().add_reader(self.dev.fileno(), self.__onReadable)
+		self.__pumpWriter()
+
+	def __pumpWriter(self):
+		# sends due output reports and schedules the next call if something is still pending
+		if(self.pumpHandle):
+			self.pumpHandle.cancel()
+			self.pumpHandle = None
+		wait = self.controller.writer.pump()
+		if(wait is not None and not self.closed):
+			self.pumpHandle = asyncio.get_running_loop().call_later(wait, self.__pumpWriter)
+
+	def __put(self, event, value):
+		if(event == 'state' and self.queue.qsize() >= self.MAX_QUEUE): return
+		self.queue.put_nowait((event, value))
+
+	def __onReadable(self):
+		# read everything which is available, so that stale motion can be skipped like in the threaded mode
+		reports = []
+		while True:
+			try:
+				reports.append((time.monotonic(), self.dev.read(64)))
+			except BlockingIOError:
+				break
+			except OSError:
+				self.close()
+				break
+		for i, (t, d) in enumerate(reports):
+			state = self.controller.processReport(t, d, len(reports) - i - 1)
+			if(state is not None and self.yieldStates):
+				self.__put('state', state.copy())
+		if(not self.closed):
+			self.__pumpWriter()
+
+	def close(self):
+		if(self.closed): return
+		self.closed = True
+		if(self.pumpHandle):
+			self.pumpHandle.cancel()
+		if(self.controller.writer):
+			self.controller.writer.close()
+		if(self.dev):
+			asyncio.get_running_loop().remove_reader(self.dev.fileno())
+			self.dev.close()
+		self.controller.evtControllerDisconnected.emit(self.controller.playerIndex)
+		self.queue.put_nowait(None)
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		event = await self.queue.get()
+		if(event is None):
+			raise StopAsyncIteration
+		return event
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+# benchmarks for the hot paths: report parsing, warping, smoothing and the complete input loop
+#   python3 benchmark.py                          print results
+#   python3 benchmark.py --json results.json      also save results
+#   python3 benchmark.py --compare results.json   fail if an op got slower than the saved results
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import wiimote
+import smoothing
+from warper import warper, loadNumpy
+from stats import Histogram
+from capture import ReplayDevice
+
+
+# synthetic reports: 0x33 and 0x37 with one moving IR dot, MotionPlus data and some button presses
+def createReport(reportType, i):
+	x = 200 + (i * 7) % 600
+	y = 100 + (i * 3) % 500
+	buttons = 0x08 if (i % 50) < 5 else 0x00
+	if(reportType == wiimote.InputReport.ButtonsAccelIr):
+		# extended IR format (3 bytes per dot, with size)
+		irDots = bytes([x & 0xff, y & 0xff, ((y >> 8) << 6) | ((x >> 8) << 4) | 0x03]) + b'\xff' * 9
+		return bytes([reportType, buttons, 0x00, 0x80, 0x80, 0x9a]) + irDots
+	irDots = bytes([x & 0xff, y & 0xff, ((y >> 8) << 6) | ((x >> 8) << 4) | 0x0f, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff])
+	return bytes([reportType, buttons, 0x00, 0x80, 0x80, 0x9a]) + irDots + bytes([0x7f, 0x7f, 0x7f, 0x7e, 0x7e, 0x7e])
+
+def createWarper():
+	w = warper()
+	w.setSource(249, 480, 824, 504, 294, 89, 893, 181)
+	w.setDestination(96, 54, 1824, 54, 96, 1026, 1824, 1026)
+	w.computeWarp()
+	return w
+
+def measure(name, fn, iterations):
+	# fn(i) is called once per iteration and timed individually
+	clock = time.perf_counter_ns
+	histogram = Histogram()
+	for i in range(min(1000, iterations)): fn(i) # warm up
+	for i in range(iterations):
+		t0 = clock()
+		fn(i)
+		histogram.add(clock() - t0)
+	return result(name, histogram)
+
+def result(name, histogram):
+	summary = histogram.summary()
+	return {
+		'name': name,
+		'ops': 1e6 / summary['mean'] if summary['mean'] else 0,
+		'p50': summary['p50'],
+		'p99': summary['p99'],
+	}
+
+def benchParse(iterations):
+	results = []
+	state = wiimote.State()
+	for reportType, fn in [
+		(wiimote.InputReport.ButtonsAccelIr, wiimote.parseButtonsAccelIrState),
+		(wiimote.InputReport.ButtonsAccelIrExtension, wiimote.parseButtonsAccelIrExtensionState),
+	]:
+		reports = [createReport(reportType, i) for i in range(256)]
+		results.append(measure('parse.'+fn.__name__, lambda i: fn(reports[i & 0xff], state), iterations))
+	return results
+
+def benchWarp(iterations):
+	numpy = loadNumpy()
+	w = createWarper()
+	results = [
+		measure('warp.computeWarp', lambda i: (w.setSource(249, 480, 824, 504, 294, 89, 893, 181), w.computeWarp()), max(1, iterations // 100)),
+		measure('warp.warp', lambda i: w.warp(i % 1024, i % 768), iterations),
+	]
+	# batch API, per batch of 4 points (all IR dots of a report)
+	points = [(random.uniform(0, 1023), random.uniform(0, 767)) for i in range(4)]
+	results.append(measure('warp.warpMany(4)', lambda i: w.warpMany(points), iterations))
+	if(numpy is not None):
+		array = numpy.array([(random.uniform(0, 1023), random.uniform(0, 767)) for i in range(1024)])
+		results.append(measure('warp.warpMany(numpy 1024)', lambda i: w.warpMany(array), max(1, iterations // 100)))
+	return results
+
+def benchSmooth(iterations):
+	results = []
+	for name in smoothing.FILTERS:
+		f = smoothing.createFilter({'filter': name})
+		results.append(measure('smooth.'+name, lambda i: f.filter(i % 1024, i % 768, i * 0.01), iterations))
+	return results
+
+def benchInputLoop(iterations):
+	# complete pass through reader and dispatcher threads, with a replayed device (1000 reports/s)
+	# and the null output backend; measured from dequeuing a report until the output is flushed
+	reports = [(i * 0.001, createReport(wiimote.InputReport.ButtonsAccelIrExtension, i)) for i in range(iterations)]
+	controller = wiimote.Controller()
+	controller.configPath = tempfile.gettempdir()+'/wiimote4linux-benchmark-nonexistent.ini'
+	controller.outputBackend = 'null'
+	controller.operationMode = wiimote.ControllerOperationMode.DRAWING
+	controller.evtControllerDisconnected = controller.evtStatusReport = NullSignal()
+	controller.evtLaserPointer = controller.evtCalibrationChanged = NullSignal()
+	controller.enableStats()
+	controller.start(1920, 1080, dev=ReplayDevice(reports=reports, realtime=True))
+	# the config file does not exist, so set up calibration and drawing mode afterwards
+	controller.warpMatrix.setSource(249, 480, 824, 504, 294, 89, 893, 181)
+	controller.warpMatrix.computeWarp()
+	controller.operationMode = wiimote.ControllerOperationMode.DRAWING
+	controller.dispatchLoop.join()
+	return [
+		result('loop.dispatch', controller.stats.histograms['dispatch']),
+		result('loop.queue', controller.stats.histograms['read']),
+	]
+
+class NullSignal:
+	def emit(self, *args):
+		pass
+
+def benchWarpScalarBatch(points=(4, 64, 1024), repeat=5):
+	# micro-benchmark: scalar _warp vs. batch API, in nanoseconds per point
+	import timeit
+	numpy = loadNumpy()
+	w = createWarper()
+	print('{:>6} {:>14} {:>14} {:>14}'.format('points', 'scalar _warp', 'warpMany', 'numpy'))
+	for n in points:
+		pts = [(random.uniform(0, 1023), random.uniform(0, 767)) for i in range(n)]
+		number = max(1, 20000 // n)
+		def scalar():
+			for x, y in pts: w._warp(w.warpMat, x, y)
+		results = [
+			min(timeit.repeat(scalar, number=number, repeat=repeat)),
+			min(timeit.repeat(lambda: w._warpMany(w.warpMat, pts), number=number, repeat=repeat)),
+		]
+		if(numpy is not None):
+			arr = numpy.array(pts)
+			results.append(min(timeit.repeat(lambda: w._warpNumpy(w.warpMat, arr), number=number, repeat=repeat)))
+		print('{:>6} {}'.format(n, ' '.join(['{:>11.1f} ns'.format(t / number / n * 1e9) for t in results])))
+	if(numpy is None):
+		print('(numpy not installed, numpy path skipped)')
+
+def compare(results, baselinePath, tolerance):
+	# returns the names of all ops which are slower than the baseline (ops/s and p99)
+	with open(baselinePath) as f:
+		baseline = {r['name']: r for r in json.load(f)['results']}
+	regressions = []
+	for r in results:
+		b = baseline.get(r['name'])
+		if(not b or r['name'].startswith('loop.queue')): continue
+		if(r['ops'] < b['ops'] * (1 - tolerance) or r['p99'] > b['p99'] * (1 + tolerance) + 1):
+			regressions.append(r['name'])
+			print('REGRESSION {}: {:.0f} ops/s (baseline {:.0f}), p99 {:.1f} µs (baseline {:.1f})'.format(
+				r['name'], r['ops'], b['ops'], r['p99'], b['p99']
+			))
+	return regressions
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Wiimote4Linux hot path benchmarks')
+	parser.add_argument('--iterations', type=int, default=20000)
+	parser.add_argument('--json', help='save results to this file')
+	parser.add_argument('--compare', help='compare with results saved before')
+	parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown for --compare (default 20%%)')
+	parser.add_argument('--warp-batch', action='store_true', help='only run the scalar vs. batch warp micro-benchmark')
+	args = parser.parse_args()
+
+	if(args.warp_batch):
+		benchWarpScalarBatch()
+		sys.exit(0)
+
+	random.seed(0)
+	results = (
+		benchParse(args.iterations)
+		+ benchWarp(args.iterations)
+		+ benchSmooth(args.iterations)
+		+ benchInputLoop(min(args.iterations, 2000))
+	)
+	print('{:<40} {:>12} {:>10} {:>10}'.format('benchmark', 'ops/s', 'p50 µs', 'p99 µs'))
+	for r in results:
+		print('{:<40} {:>12.0f} {:>10.2f} {:>10.2f}'.format(r['name'], r['ops'], r['p50'], r['p99']))
+
+	if(args.json):
+		with open(args.json, 'w') as f:
+			json.dump({
+				'python': platform.python_version(),
+				'machine': platform.machine(),
+				'processor': platform.processor(),
+				'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+				'results': results,
+			}, f, indent=4)
+	if(args.compare and compare(results, args.compare, args.tolerance)):
+		sys.exit(1)
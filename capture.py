@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import struct
+import sys
+import time
+
+# capture files of raw input reports, e.g. for benchmarks and tests without a Wiimote
+# format: magic + version, then per report: time since previous report (µs, uint32), length (uint8), report bytes
+
+MAGIC = b'W4LCAP'
+VERSION = 1
+HEADER = struct.Struct('<6sH')
+RECORD = struct.Struct('<IB')
+
+class CaptureWriter:
+	def __init__(self, path):
+		self.file = open(path, 'wb')
+		self.file.write(HEADER.pack(MAGIC, VERSION))
+		self.last = None
+
+	def write(self, t, data):
+		# t: timestamp in seconds (time.monotonic())
+		delta = 0 if self.last is None else int((t - self.last) * 1e6)
+		self.last = t
+		data = bytes(data)
+		self.file.write(RECORD.pack(min(max(0, delta), 0xffffffff), len(data)) + data)
+
+	def close(self):
+		self.file.close()
+
+def readCapture(path):
+	# returns a list of (timestamp in seconds relative to the first report, report bytes)
+	with open(path, 'rb') as f:
+		content = f.read()
+	magic, version = HEADER.unpack_from(content, 0)
+	if(magic != MAGIC or version != VERSION):
+		raise ValueError(f'{path} is not a Wiimote4Linux capture file')
+	reports = []
+	offset = HEADER.size
+	t = 0.0
+	while offset < len(content):
+		delta, length = RECORD.unpack_from(content, offset)
+		offset += RECORD.size
+		t += delta / 1e6
+		reports.append((t, content[offset:offset+length]))
+		offset += length
+	return reports
+
+class ReplayDevice:
+	# stand-in for hid.Device which plays back a capture file
+	# realtime=False returns the reports as fast as possible
+	# after the last report, read() raises an exception like a disconnected device
+	product = 'Wiimote4Linux Replay'
+	serial = 'replay'
+
+	def __init__(self, path=None, realtime=True, loop=False, reports=None):
+		self.reports = reports if reports is not None else readCapture(path)
+		self.realtime = realtime
+		self.loop = loop
+		self.index = 0
+		self.start = None
+		self.written = []
+
+	def read(self, size, timeout=None):
+		if(self.index >= len(self.reports)):
+			if(not self.loop or not self.reports):
+				raise Exception('End of capture')
+			self.index = 0
+			self.start = None
+		t, data = self.reports[self.index]
+		self.index += 1
+		if(self.realtime):
+			if(self.start is None):
+				self.start = time.monotonic() - t
+			wait = self.start + t - time.monotonic()
+			if(wait > 0): time.sleep(wait)
+		return data[:size]
+
+	def write(self, data):
+		self.written.append(bytes(data))
+		return len(data)
+
+	def close(self):
+		pass
+
+
+if __name__ == '__main__':
+	# print a capture file
+	for t, data in readCapture(sys.argv[1]):
+		print('{:10.6f} {}'.format(t, data.hex()))
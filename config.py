@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import atexit
+import configparser
+import io
+import os
+import threading
+
+# config file shared by all controllers: parsed once and parsed again only when the file changed
+# on disk; changes are written by a background thread (the input threads never wait for the disk),
+# atomically via a temporary file and rename, so a crash never leaves a truncated config
+#
+# load() returns a parser which must not be modified, update() replaces it with a changed copy
+# values are raw (no % interpolation), they are written back exactly as read
+
+class ConfigStore:
+	def __init__(self, path):
+		self.path = path
+		self.parser = None
+		self.fileStamp = None
+		self.dirty = False
+		self.writing = False
+		self.condition = threading.Condition()
+		self.thread = None
+
+	def load(self):
+		with self.condition:
+			stamp = self.__stamp()
+			if(self.parser is None or (stamp != self.fileStamp and not self.dirty and not self.writing)):
+				parser = configparser.RawConfigParser()
+				parser.read(self.path)
+				self.parser = parser
+				self.fileStamp = stamp
+			return self.parser
+
+	def update(self, section, values, removeOptions=()):
+		# sets the values (dict) in the section, creating it if necessary, and schedules the write
+		with self.condition:
+			# copied through its text: read_dict() would copy the DEFAULT keys into every section
+			text = io.StringIO()
+			self.load().write(text)
+			parser = configparser.RawConfigParser()
+			parser.read_string(text.getvalue(), self.path)
+			if(not parser.has_section(section)):
+				parser.add_section(section)
+			for key in removeOptions:
+				parser.remove_option(section, key)
+			for key, value in values.items():
+				parser[section][key] = str(value)
+			self.parser = parser
+			self.dirty = True
+			if(self.thread is None):
+				self.thread = threading.Thread(target=self.__loop, daemon=True)
+				self.thread.start()
+			self.condition.notify()
+
+	def flush(self, timeout=2.0):
+		# waits until all changes are written, e.g. before the process exits
+		with self.condition:
+			self.condition.wait_for(lambda: not self.dirty and not self.writing, timeout)
+
+	def __loop(self):
+		while True:
+			with self.condition:
+				self.condition.wait_for(lambda: self.dirty)
+				# several updates in a row are written once
+				parser = self.parser
+				self.dirty = False
+				self.writing = True
+			try:
+				self.__write(parser)
+			except OSError as e:
+				print('Unable to write config file:', e)
+			with self.condition:
+				self.writing = False
+				if(not self.dirty): self.fileStamp = self.__stamp()
+				self.condition.notify_all()
+
+	def __write(self, parser):
+		directory = os.path.dirname(self.path)
+		if(directory): os.makedirs(directory, exist_ok=True)
+		tempPath = self.path+'.tmp'
+		with open(tempPath, 'w') as f:
+			parser.write(f)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(tempPath, self.path)
+
+	def __stamp(self):
+		try:
+			stat = os.stat(self.path)
+			return (stat.st_mtime_ns, stat.st_size)
+		except OSError:
+			return None
+
+stores = {}
+storesLock = threading.Lock()
+
+def configStore(path):
+	# one store per file, shared by all controllers of the process
+	with storesLock:
+		store = stores.get(path)
+		if(store is None):
+			store = stores[path] = ConfigStore(path)
+			atexit.register(store.flush)
+		return store
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import glob
+import os
+
+# direct access to Linux hidraw devices, without hidapi
+# in contrast to hid.Device, the file descriptor can be used with select/poll/asyncio
+
+SYSFS_HIDRAW = '/sys/class/hidraw'
+
+def readUevent(hidrawName):
+	values = {}
+	try:
+		with open(f'{SYSFS_HIDRAW}/{hidrawName}/device/uevent') as f:
+			for line in f:
+				key, _, value = line.strip().partition('=')
+				values[key] = value
+	except OSError:
+		pass
+	return values
+
+def parseHidId(hidId):
+	# HID_ID=0005:0000057E:00000306 (bus, vendor, product)
+	parts = hidId.split(':')
+	if(len(parts) != 3): return None, None
+	return int(parts[1], 16), int(parts[2], 16)
+
+def enumerate(ids):
+	# ids: list of {'vid': ..., 'pid': ...}; returns device info dicts like hid.enumerate()
+	devices = []
+	for sysPath in sorted(glob.glob(f'{SYSFS_HIDRAW}/hidraw*')):
+		name = os.path.basename(sysPath)
+		uevent = readUevent(name)
+		vid, pid = parseHidId(uevent.get('HID_ID', ''))
+		if(not any(id['vid'] == vid and id['pid'] == pid for id in ids)): continue
+		devices.append({
+			'path': '/dev/'+name,
+			'vendor_id': vid,
+			'product_id': pid,
+			'product_string': uevent.get('HID_NAME', ''),
+			'serial_number': uevent.get('HID_UNIQ', ''),
+		})
+	return devices
+
+class HidrawDevice:
+	def __init__(self, path, nonBlocking=False):
+		if(isinstance(path, bytes)): path = path.decode()
+		self.path = path
+		self.fd = os.open(path, os.O_RDWR | (os.O_NONBLOCK if nonBlocking else 0))
+		uevent = readUevent(os.path.basename(path))
+		self.product = uevent.get('HID_NAME', '')
+		self.serial = uevent.get('HID_UNIQ', '')
+
+	def fileno(self):
+		return self.fd
+
+	def read(self, size, timeout=None):
+		# in non-blocking mode, BlockingIOError is raised if no report is available
+		data = os.read(self.fd, size)
+		if(not data):
+			raise OSError('Device disconnected')
+		return data
+
+	def write(self, data):
+		return os.write(self.fd, bytes(data))
+
+	def close(self):
+		if(self.fd is not None):
+			os.close(self.fd)
+			self.fd = None
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import threading
+
+# notifies about new hidraw devices without polling:
+# via udev netlink events (pyudev) if available, otherwise via inotify on /dev
+
+class HotplugWatcher:
+	def __init__(self, callback):
+		# callback() is called from the watcher thread whenever a hidraw device was added
+		self.callback = callback
+		self.observer = None
+		try:
+			self.__startUdev()
+		except ImportError:
+			self.__startInotify()
+
+	def __startUdev(self):
+		import pyudev
+		context = pyudev.Context()
+		monitor = pyudev.Monitor.from_netlink(context)
+		monitor.filter_by(subsystem='hidraw')
+		def onDevice(device):
+			# udev rules (e.g. permissions) are already applied when the event arrives
+			if(device.action == 'add'): self.callback()
+		self.observer = pyudev.MonitorObserver(monitor, callback=onDevice, name='wiimote-hotplug')
+		self.observer.daemon = True
+		self.observer.start()
+
+	def __startInotify(self):
+		IN_CREATE = 0x100
+		IN_ATTRIB = 0x004
+		libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+		fd = libc.inotify_init1(os.O_CLOEXEC)
+		if(fd < 0 or libc.inotify_add_watch(fd, b'/dev', IN_CREATE | IN_ATTRIB) < 0):
+			raise OSError(ctypes.get_errno(), 'Unable to watch /dev')
+		def loop():
+			event = struct.Struct('iIII')
+			while True:
+				data = os.read(fd, 4096)
+				offset = 0
+				found = False
+				while offset < len(data):
+					wd, mask, cookie, length = event.unpack_from(data, offset)
+					name = data[offset+event.size:offset+event.size+length].rstrip(b'\x00')
+					offset += event.size + length
+					# IN_ATTRIB: udev changes the permissions shortly after the node was created
+					if(name.startswith(b'hidraw')): found = True
+				if(found): self.callback()
+		self.observer = threading.Thread(target=loop, daemon=True, name='wiimote-hotplug')
+		self.observer.start()
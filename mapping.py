@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+# maps buttons, chords, long presses and accelerometer gestures to actions
+# the bindings are compiled once into a table indexed by the state word (button bits plus
+# gesture bits), so a report costs one lookup; all active bindings run independently
+
+# bits of the core button word (State.buttons)
+BUTTONS = {
+	'left':  0x0100,
+	'right': 0x0200,
+	'down':  0x0400,
+	'up':    0x0800,
+	'plus':  0x1000,
+	'two':   0x0001,
+	'one':   0x0002,
+	'b':     0x0004,
+	'a':     0x0008,
+	'minus': 0x0010,
+	'home':  0x0080,
+}
+BUTTON_MASK = 0x1f9f
+
+# virtual bits for gestures, above the button word
+GESTURES = {
+	'shake':      0x010000,
+	'tilt-left':  0x020000,
+	'tilt-right': 0x040000,
+	'tilt-up':    0x080000,
+	'tilt-down':  0x100000,
+}
+
+# action with optional argument, e.g. key:pagedown or volume:+1
+ACTIONS = ['key', 'volume', 'laserpointer', 'scroll', 'rumble', 'calibrate', 'none']
+
+DEFAULT_BINDINGS = {
+	'up':    'key:up',
+	'down':  'key:down',
+	'left':  'key:left',
+	'right': 'key:right',
+	'plus':  'volume:+1',
+	'minus': 'volume:-1',
+	'a':     'laserpointer',
+	'b':     'laserpointer',
+	'home':  'calibrate',
+}
+
+class Binding:
+	__slots__ = ('trigger', 'mask', 'long', 'deferred', 'action', 'argument')
+
+	def __init__(self, trigger, action):
+		# trigger: button names or gestures joined by "+", optionally prefixed with "long-"
+		self.trigger = trigger
+		self.long = trigger.startswith('long-')
+		self.deferred = False
+		self.mask = 0
+		for name in trigger[5 if self.long else 0:].split('+'):
+			name = name.strip()
+			if(name in BUTTONS): self.mask |= BUTTONS[name]
+			elif(name in GESTURES): self.mask |= GESTURES[name]
+			else: raise ValueError(f'Unknown button or gesture "{name}" in "{trigger}"')
+		self.action, _, self.argument = action.strip().partition(':')
+		if(self.action not in ACTIONS):
+			raise ValueError(f'Unknown action "{action}", use one of: '+', '.join(ACTIONS))
+		# numeric arguments are checked here, so an invalid one is reported when the config is loaded
+		try:
+			if(self.action == 'volume'): int(self.argument or 1)
+			elif(self.action == 'scroll'): float(self.argument or 1)
+		except ValueError:
+			raise ValueError(f'Invalid argument "{self.argument}" of "{action}", a number is expected') from None
+
+def loadBindings(config):
+	# config: dict trigger -> action (e.g. the [buttons] config section), merged into the defaults;
+	# "none" removes a default binding
+	merged = dict(DEFAULT_BINDINGS)
+	merged.update(config)
+	return [Binding(trigger, action) for trigger, action in merged.items() if action.strip() != 'none']
+
+class GestureDetector:
+	# shake = acceleration above SHAKE_G, tilt = gravity mostly along the x/y axis of the remote
+	# (left side or nose down/up); calibrated values in g, no trigonometry per report
+	SHAKE_G = 2.0
+	SHAKE_HOLD = 0.5 # seconds the shake bit stays set, so one shake triggers once
+	TILT = 0.6 # sin(~37°)
+
+	def __init__(self):
+		self.shakeUntil = 0.0
+		self.shakeLimit = self.SHAKE_G ** 2
+		self.tiltLimit = self.TILT
+
+	def detect(self, ax, ay, az, t):
+		if(ax*ax + ay*ay + az*az > self.shakeLimit):
+			self.shakeUntil = t + self.SHAKE_HOLD
+		if(t < self.shakeUntil):
+			return GESTURES['shake']
+		bits = 0
+		limit = self.tiltLimit
+		if(ax > limit): bits |= GESTURES['tilt-left']
+		elif(ax < -limit): bits |= GESTURES['tilt-right']
+		if(ay > limit): bits |= GESTURES['tilt-up']
+		elif(ay < -limit): bits |= GESTURES['tilt-down']
+		return bits
+
+class ButtonMapping:
+	LONG_PRESS = 0.8 # seconds
+
+	def __init__(self, bindings, handler):
+		# handler(binding, active): called when a binding starts (True) and ends (False)
+		self.bindings = bindings
+		self.handler = handler
+		self.usesGestures = any(b.mask & ~BUTTON_MASK for b in bindings)
+		longMasks = {b.mask for b in bindings if b.long}
+		for b in bindings:
+			# a short binding on the same buttons as a long one fires on release (tap)
+			b.deferred = not b.long and b.mask in longMasks
+		# all button combinations are compiled up front, gesture combinations on first use
+		self.table = {}
+		bits = [bit for bit in range(16) if BUTTON_MASK & (1 << bit)]
+		for n in range(1 << len(bits)):
+			word = 0
+			for i, bit in enumerate(bits):
+				if(n & (1 << i)): word |= 1 << bit
+			self.table[word] = self.__compile(word)
+		self.word = 0
+		self.active = ()
+		self.since = {}
+		self.fired = set()
+		self.waiting = []
+
+	def __compile(self, word):
+		# bindings whose buttons are all held; a chord hides the bindings of its single buttons
+		held = [b for b in self.bindings if b.mask & word == b.mask]
+		return tuple(b for b in held if not any(o.mask != b.mask and o.mask & b.mask == b.mask for o in held))
+
+	def update(self, word, t):
+		# word: button word | gesture bits of the current report
+		changed = word ^ self.word
+		if(not changed and not self.waiting): return
+		if(changed):
+			active = self.table.get(word)
+			if(active is None):
+				active = self.table[word] = self.__compile(word)
+			previous = self.active
+			longFired = {b.mask for b in previous if b.long and b in self.fired}
+			for b in previous:
+				if(b not in active): self.__end(b, t, longFired)
+			for b in active:
+				if(b in previous): continue
+				self.since[b] = t
+				if(not b.long and not b.deferred):
+					self.fired.add(b)
+					self.handler(b, True)
+			self.word = word
+			self.active = active
+			self.waiting = [b for b in active if b.long and b not in self.fired]
+		if(self.waiting):
+			for b in list(self.waiting):
+				if(t - self.since[b] >= self.LONG_PRESS):
+					self.waiting.remove(b)
+					self.fired.add(b)
+					self.handler(b, True)
+
+	def __end(self, b, t, longFired):
+		if(b in self.fired):
+			self.fired.discard(b)
+			self.handler(b, False)
+		elif(b.deferred and b.mask not in longFired and t - self.since[b] < self.LONG_PRESS):
+			# tap: released before the long press fired
+			self.handler(b, True)
+			self.handler(b, False)
+
+	def reset(self):
+		# ends all active bindings (without taps), e.g. on disconnect
+		for b in self.active:
+			if(b in self.fired): self.handler(b, False)
+		self.word = 0
+		self.active = ()
+		self.fired.clear()
+		self.waiting = []
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import collections
+import struct
+import threading
+
+# reads EEPROM/register memory of the remote: ReadMemory output reports (0x17) are answered by
+# one or more ReadData input reports (0x21) with up to 16 bytes each; the remote handles one read
+# at a time, so requests are queued and sent after the previous one completed (or timed out)
+
+REPORT_READ_MEMORY = 0x17 # OutputReport.ReadMemory
+REGISTER_SPACE     = 0x04000000 # address flag for control registers instead of EEPROM
+
+class MemoryReader:
+	TIMEOUT = 1.0 # seconds until an unanswered read fails, e.g. with a replayed capture
+
+	def __init__(self, writer):
+		self.writer = writer
+		self.requests = collections.deque() # (address, size, callback)
+		self.pending = None
+		self.data = bytearray()
+		self.deadline = 0.0
+		self.lock = threading.Lock()
+
+	def read(self, address, size, callback, t):
+		# callback(data) is called by handleReport() with the read bytes, or with None on error
+		with self.lock:
+			self.requests.append((address, size, callback))
+			if(self.pending is None):
+				self.__sendNext(t)
+
+	def handleReport(self, d, t):
+		# d: ReadData input report [0x21, buttons, buttons, size-1 << 4 | error, address (2 bytes), data]
+		with self.lock:
+			if(self.pending is None): return
+			address, size, callback = self.pending
+			error = d[3] & 0x0f
+			if(error):
+				print('Memory read at {:#x} failed with error {}'.format(address, error))
+				result = None
+			else:
+				self.data += d[6:6 + (d[3] >> 4) + 1]
+				if(len(self.data) < size):
+					self.deadline = t + self.TIMEOUT
+					return
+				result = bytes(self.data[:size])
+			self.__sendNext(t)
+		callback(result)
+
+	def checkTimeout(self, t):
+		with self.lock:
+			if(self.pending is None or t < self.deadline): return
+			address, size, callback = self.pending
+			self.__sendNext(t)
+		callback(None)
+
+	def __sendNext(self, t):
+		self.pending = self.requests.popleft() if self.requests else None
+		self.data = bytearray()
+		if(self.pending is None): return
+		address, size, callback = self.pending
+		self.deadline = t + self.TIMEOUT
+		self.writer.send(struct.pack('>BIH', REPORT_READ_MEMORY, address, size))
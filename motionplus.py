@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import math
+
+# WiiMotionPlus gyro handling: fast/slow mode scaling, gyro bias calibration while the remote
+# rests, and fusion with the accelerometer into an orientation estimate (in degrees)
+# signs follow the laser pointer: positive yaw = turning right, positive pitch = nose up
+class MotionPlus:
+	SLOW_SCALE = 8192 / 595.0                 # raw units per deg/s in slow mode (up to ~440 deg/s)
+	FAST_SCALE = SLOW_SCALE * 440.0 / 2000.0  # fast mode covers up to ~2000 deg/s
+	ZERO       = 8192                         # nominal raw value at rest
+
+	REST_SAMPLES     = 100   # reports the remote must be still before the bias is taken (~1 s)
+	REST_GYRO_RANGE  = 40    # max. raw gyro spread during rest (~3 deg/s)
+	REST_ACCEL_RANGE = 3     # max. raw accel spread during rest
+	BIAS_WEIGHT      = 0.5   # weight of a new rest measurement against the current bias
+
+	ACCEL_WEIGHT = 0.02      # per report pull of pitch/roll towards gravity (complementary filter)
+
+	MAX_DT = 0.1             # longer gaps (e.g. dropped reports) are not integrated
+	ACTIVATION_TIMEOUT = 2.0 # seconds without MotionPlus data before it is activated again
+	MAX_ACTIVATION_TIMEOUT = 30.0 # retries back off up to this, e.g. for remotes without MotionPlus
+
+	def __init__(self, yawBias=None, rollBias=None, pitchBias=None):
+		# initial gyro bias in raw units, e.g. from the config file; refined automatically at rest
+		self.bias = [
+			yawBias if yawBias is not None else self.ZERO,
+			rollBias if rollBias is not None else self.ZERO,
+			pitchBias if pitchBias is not None else self.ZERO,
+		]
+		self.calibrated = False
+		self.yaw = 0.0
+		self.roll = 0.0
+		self.pitch = 0.0
+		self.lastTime = None
+		self.lastData = None
+		self.lastActivation = None
+		self.activationTimeout = self.ACTIVATION_TIMEOUT
+		self.__resetRest()
+
+	def __resetRest(self):
+		self.restCount = 0
+		self.restSum = [0, 0, 0]
+		self.restMin = None
+		self.restMax = None
+
+	def reset(self):
+		# orientation relative to the current pose
+		self.yaw = self.roll = self.pitch = 0.0
+		self.lastTime = None
+
+	def activated(self, t):
+		# called whenever the activation register was written
+		if(self.lastActivation is not None and (self.lastData is None or self.lastData < self.lastActivation)):
+			# the last activation did not bring any data
+			self.activationTimeout = min(self.activationTimeout * 2, self.MAX_ACTIVATION_TIMEOUT)
+		self.lastActivation = t
+
+	def needsActivation(self, t):
+		# the MotionPlus deactivates itself sometimes, e.g. after a short loss of power;
+		# only re-activate if no data arrived for a while, and not more often than the timeout
+		if(self.lastActivation is not None and t - self.lastActivation < self.activationTimeout):
+			return False
+		return self.lastData is None or t - self.lastData >= self.ACTIVATION_TIMEOUT
+
+	def update(self, s, t):
+		# s: State with raw MotionPlus and calibrated accel values, t: report timestamp
+		# returns False if the report did not carry MotionPlus data
+		if(not s.motionPlusData):
+			return False
+		self.lastData = t
+		self.activationTimeout = self.ACTIVATION_TIMEOUT
+		raw = (s.yaw, s.roll, s.pitch)
+		self.__detectRest(raw, s)
+
+		dt = t - self.lastTime if self.lastTime is not None else 0.0
+		self.lastTime = t
+		if(dt <= 0.0 or dt > self.MAX_DT):
+			return True
+		bias = self.bias
+		yawRate   = (raw[0] - bias[0]) / (self.FAST_SCALE if s.yawFast else self.SLOW_SCALE)
+		rollRate  = (raw[1] - bias[1]) / (self.FAST_SCALE if s.rollFast else self.SLOW_SCALE)
+		pitchRate = (raw[2] - bias[2]) / (self.FAST_SCALE if s.pitchFast else self.SLOW_SCALE)
+		self.yaw   += yawRate * dt
+		self.roll  += rollRate * dt
+		self.pitch += pitchRate * dt
+
+		# gravity gives absolute pitch and roll (but not yaw) if the remote is not accelerated
+		ax = s.gx
+		ay = s.gy
+		az = s.gz
+		magnitude = math.sqrt(ax*ax + ay*ay + az*az)
+		if(0.8 < magnitude < 1.2):
+			self.pitch += (math.degrees(math.atan2(ay, math.sqrt(ax*ax + az*az))) - self.pitch) * self.ACCEL_WEIGHT
+			self.roll  += (math.degrees(math.atan2(ax, az)) - self.roll) * self.ACCEL_WEIGHT
+		return True
+
+	def __detectRest(self, raw, s):
+		# slow mode and a small spread of gyro and accel values over REST_SAMPLES reports
+		# means the remote lies still, so the mean gyro value is its bias
+		values = raw + (s.x, s.y, s.z)
+		if(s.yawFast or s.rollFast or s.pitchFast):
+			self.__resetRest()
+			return
+		if(self.restCount == 0):
+			self.restMin = list(values)
+			self.restMax = list(values)
+		else:
+			restMin = self.restMin
+			restMax = self.restMax
+			for i in range(6):
+				v = values[i]
+				if(v < restMin[i]): restMin[i] = v
+				elif(v > restMax[i]): restMax[i] = v
+				if(restMax[i] - restMin[i] > (self.REST_GYRO_RANGE if i < 3 else self.REST_ACCEL_RANGE)):
+					self.__resetRest()
+					return
+		self.restCount += 1
+		restSum = self.restSum
+		restSum[0] += raw[0]; restSum[1] += raw[1]; restSum[2] += raw[2]
+		if(self.restCount >= self.REST_SAMPLES):
+			weight = self.BIAS_WEIGHT if self.calibrated else 1.0
+			for i in range(3):
+				self.bias[i] += (restSum[i] / self.restCount - self.bias[i]) * weight
+			self.calibrated = True
+			self.__resetRest()
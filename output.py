@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+# output backends for pointer and key injection
+# all pointer changes of one report are collected and flushed with sync()
+# backends with multiTouch = True also support touch() with several contacts
+# scroll() takes wheel detents (positive = up/right), fractions are accumulated; zoom() is Ctrl + wheel
+
+class PyAutoGuiBackend:
+	name = 'pyautogui'
+	multiTouch = False
+
+	def __init__(self, screenWidth, screenHeight):
+		import pyautogui
+		pyautogui.PAUSE = 0
+		self.pyautogui = pyautogui
+		self.scrollRemainder = [0.0, 0.0, 0.0] # vertical, horizontal, zoom
+
+	def moveTo(self, x, y):
+		self.pyautogui.moveTo(x, y)
+
+	def mouseDown(self):
+		self.pyautogui.mouseDown()
+
+	def mouseUp(self):
+		self.pyautogui.mouseUp()
+
+	def pressKey(self, key):
+		self.pyautogui.press(key)
+
+	def scroll(self, amount, horizontal=False):
+		clicks = self.__clicks(1 if horizontal else 0, amount)
+		if(not clicks): return
+		if(horizontal): self.pyautogui.hscroll(clicks)
+		else: self.pyautogui.scroll(clicks)
+
+	def zoom(self, amount):
+		clicks = self.__clicks(2, amount)
+		if(not clicks): return
+		self.pyautogui.keyDown('ctrl')
+		self.pyautogui.scroll(clicks)
+		self.pyautogui.keyUp('ctrl')
+
+	def __clicks(self, axis, amount):
+		self.scrollRemainder[axis] += amount
+		clicks = int(self.scrollRemainder[axis])
+		self.scrollRemainder[axis] -= clicks
+		return clicks
+
+	def sync(self):
+		pass
+
+	def close(self):
+		pass
+
+class UinputBackend:
+	# virtual absolute pointing device (like a touchscreen) plus keyboard via /dev/uinput
+	# works on X11 and Wayland, and avoids the Xlib round trips of pyautogui
+	name = 'uinput'
+	multiTouch = True
+	MAX_CONTACTS = 4 # one per IR blob
+
+	def __init__(self, screenWidth, screenHeight):
+		import evdev
+		from evdev import ecodes
+		self.ecodes = ecodes
+		# key names as in pyautogui
+		self.keys = {
+			'up':       ecodes.KEY_UP,
+			'down':     ecodes.KEY_DOWN,
+			'left':     ecodes.KEY_LEFT,
+			'right':    ecodes.KEY_RIGHT,
+			'pageup':   ecodes.KEY_PAGEUP,
+			'pagedown': ecodes.KEY_PAGEDOWN,
+			'home':     ecodes.KEY_HOME,
+			'end':      ecodes.KEY_END,
+			'space':    ecodes.KEY_SPACE,
+			'enter':    ecodes.KEY_ENTER,
+			'esc':      ecodes.KEY_ESC,
+			'tab':      ecodes.KEY_TAB,
+			'f5':       ecodes.KEY_F5,
+			'b':        ecodes.KEY_B,
+			'ctrl':     ecodes.KEY_LEFTCTRL,
+		}
+		maxX = evdev.AbsInfo(value=0, min=0, max=max(1, int(screenWidth)-1), fuzz=0, flat=0, resolution=0)
+		maxY = evdev.AbsInfo(value=0, min=0, max=max(1, int(screenHeight)-1), fuzz=0, flat=0, resolution=0)
+		self.pointer = evdev.UInput({
+			ecodes.EV_KEY: [ecodes.BTN_TOUCH, ecodes.BTN_LEFT],
+			ecodes.EV_ABS: [
+				(ecodes.ABS_X, maxX),
+				(ecodes.ABS_Y, maxY),
+				# multi-touch protocol type B (slots)
+				(ecodes.ABS_MT_SLOT, evdev.AbsInfo(value=0, min=0, max=self.MAX_CONTACTS-1, fuzz=0, flat=0, resolution=0)),
+				(ecodes.ABS_MT_TRACKING_ID, evdev.AbsInfo(value=0, min=0, max=0xffff, fuzz=0, flat=0, resolution=0)),
+				(ecodes.ABS_MT_POSITION_X, maxX),
+				(ecodes.ABS_MT_POSITION_Y, maxY),
+			],
+		}, name='Wiimote4Linux Pointer', input_props=[ecodes.INPUT_PROP_DIRECT])
+		# tracking ID per slot, None = free
+		self.slots = [None] * self.MAX_CONTACTS
+		# libinput ignores the single touch axes of a multi-touch device, so the single pen
+		# (moveTo/mouseDown/mouseUp) is sent as contact in slot 0 as well, with its own tracking IDs
+		self.penTrackingId = 0
+		self.keyboard = evdev.UInput({
+			ecodes.EV_KEY: list(self.keys.values()),
+		}, name='Wiimote4Linux Keyboard')
+		# relative wheel in a separate device, so that the pointer stays a touchscreen;
+		# high resolution events (1/120 detent, Linux 5.0) for smooth scrolling plus the classic ones
+		self.relWheelHiRes = getattr(ecodes, 'REL_WHEEL_HI_RES', 0x0b)
+		self.relHWheelHiRes = getattr(ecodes, 'REL_HWHEEL_HI_RES', 0x0c)
+		self.wheel = evdev.UInput({
+			ecodes.EV_KEY: [ecodes.BTN_LEFT],
+			ecodes.EV_REL: [ecodes.REL_X, ecodes.REL_Y, ecodes.REL_WHEEL, ecodes.REL_HWHEEL, self.relWheelHiRes, self.relHWheelHiRes],
+		}, name='Wiimote4Linux Wheel')
+		# per axis (vertical, horizontal): fraction of a hi-res unit, hi-res units of the current detent
+		self.scrollRemainder = [0.0, 0.0]
+		self.scrollUnits = [0, 0]
+		self.zoomRemainder = 0.0
+		self.pending = False
+
+	def moveTo(self, x, y):
+		ecodes = self.ecodes
+		write = self.pointer.write
+		write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, 0)
+		write(ecodes.EV_ABS, ecodes.ABS_MT_POSITION_X, int(x))
+		write(ecodes.EV_ABS, ecodes.ABS_MT_POSITION_Y, int(y))
+		write(ecodes.EV_ABS, ecodes.ABS_X, int(x))
+		write(ecodes.EV_ABS, ecodes.ABS_Y, int(y))
+		self.pending = True
+
+	def mouseDown(self):
+		ecodes = self.ecodes
+		write = self.pointer.write
+		if(self.slots[0] is None):
+			self.penTrackingId = (self.penTrackingId + 1) & 0xffff
+			self.slots[0] = self.penTrackingId
+			write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, 0)
+			write(ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID, self.penTrackingId)
+		write(ecodes.EV_KEY, ecodes.BTN_TOUCH, 1)
+		write(ecodes.EV_KEY, ecodes.BTN_LEFT, 1)
+		self.pending = True
+
+	def mouseUp(self):
+		ecodes = self.ecodes
+		write = self.pointer.write
+		if(self.slots[0] is not None):
+			self.slots[0] = None
+			write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, 0)
+			write(ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID, -1)
+		write(ecodes.EV_KEY, ecodes.BTN_TOUCH, 0)
+		write(ecodes.EV_KEY, ecodes.BTN_LEFT, 0)
+		self.pending = True
+
+	def touch(self, contacts):
+		# contacts: list of (tracking ID, x, y), the first one also drives the single touch pointer;
+		# contacts keep their slot as long as their tracking ID is reported
+		ecodes = self.ecodes
+		write = self.pointer.write
+		ids = [contact[0] for contact in contacts[:self.MAX_CONTACTS]]
+		wasTouching = any(id is not None for id in self.slots)
+		for slot, id in enumerate(self.slots):
+			if(id is not None and id not in ids):
+				write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, slot)
+				write(ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID, -1)
+				self.slots[slot] = None
+		for id, x, y in contacts[:self.MAX_CONTACTS]:
+			if(id in self.slots):
+				slot = self.slots.index(id)
+				write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, slot)
+			else:
+				slot = self.slots.index(None)
+				self.slots[slot] = id
+				write(ecodes.EV_ABS, ecodes.ABS_MT_SLOT, slot)
+				write(ecodes.EV_ABS, ecodes.ABS_MT_TRACKING_ID, id)
+			write(ecodes.EV_ABS, ecodes.ABS_MT_POSITION_X, int(x))
+			write(ecodes.EV_ABS, ecodes.ABS_MT_POSITION_Y, int(y))
+		if(contacts):
+			write(ecodes.EV_ABS, ecodes.ABS_X, int(contacts[0][1]))
+			write(ecodes.EV_ABS, ecodes.ABS_Y, int(contacts[0][2]))
+		touching = bool(contacts)
+		if(touching != wasTouching):
+			write(ecodes.EV_KEY, ecodes.BTN_TOUCH, int(touching))
+		self.pending = True
+
+	def pressKey(self, key):
+		code = self.keys[key]
+		self.keyboard.write(self.ecodes.EV_KEY, code, 1)
+		self.keyboard.syn()
+		self.keyboard.write(self.ecodes.EV_KEY, code, 0)
+		self.keyboard.syn()
+
+	def scroll(self, amount, horizontal=False):
+		axis = 1 if horizontal else 0
+		self.scrollRemainder[axis] += amount * 120
+		units = int(self.scrollRemainder[axis])
+		if(not units): return
+		self.scrollRemainder[axis] -= units
+		self.scrollUnits[axis] += units
+		detents = int(self.scrollUnits[axis] / 120)
+		self.scrollUnits[axis] -= detents * 120
+		ecodes = self.ecodes
+		self.wheel.write(ecodes.EV_REL, self.relHWheelHiRes if horizontal else self.relWheelHiRes, units)
+		if(detents):
+			self.wheel.write(ecodes.EV_REL, ecodes.REL_HWHEEL if horizontal else ecodes.REL_WHEEL, detents)
+		self.wheel.syn()
+
+	def zoom(self, amount):
+		# whole detents only, applications zoom in steps anyway
+		self.zoomRemainder += amount
+		detents = int(self.zoomRemainder)
+		if(not detents): return
+		self.zoomRemainder -= detents
+		ecodes = self.ecodes
+		self.keyboard.write(ecodes.EV_KEY, ecodes.KEY_LEFTCTRL, 1)
+		self.keyboard.syn()
+		self.wheel.write(ecodes.EV_REL, self.relWheelHiRes, detents * 120)
+		self.wheel.write(ecodes.EV_REL, ecodes.REL_WHEEL, detents)
+		self.wheel.syn()
+		self.keyboard.write(ecodes.EV_KEY, ecodes.KEY_LEFTCTRL, 0)
+		self.keyboard.syn()
+
+	def sync(self):
+		# one SYN_REPORT for all pointer events of a report
+		if(self.pending):
+			self.pointer.syn()
+			self.pending = False
+
+	def close(self):
+		self.pointer.close()
+		self.keyboard.close()
+		self.wheel.close()
+
+class NullBackend:
+	# discards everything, for benchmarks and replays
+	name = 'null'
+	multiTouch = True
+
+	def __init__(self, screenWidth, screenHeight):
+		pass
+
+	def moveTo(self, x, y):
+		pass
+
+	def mouseDown(self):
+		pass
+
+	def mouseUp(self):
+		pass
+
+	def touch(self, contacts):
+		pass
+
+	def pressKey(self, key):
+		pass
+
+	def scroll(self, amount, horizontal=False):
+		pass
+
+	def zoom(self, amount):
+		pass
+
+	def sync(self):
+		pass
+
+	def close(self):
+		pass
+
+BACKENDS = {
+	UinputBackend.name: UinputBackend,
+	PyAutoGuiBackend.name: PyAutoGuiBackend,
+	NullBackend.name: NullBackend,
+}
+
+def createBackend(name, screenWidth, screenHeight):
+	# "auto" prefers uinput and falls back to pyautogui (e.g. python-evdev missing or no access to /dev/uinput)
+	if(name != 'auto'):
+		if(name not in BACKENDS):
+			raise ValueError(f'Unknown output backend "{name}", use one of: auto, '+', '.join(BACKENDS))
+		return BACKENDS[name](screenWidth, screenHeight)
+	try:
+		return UinputBackend(screenWidth, screenHeight)
+	except Exception as e:
+		print('uinput output not available, falling back to pyautogui:', e)
+		return PyAutoGuiBackend(screenWidth, screenHeight)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import collections
+import threading
+import time
+
+# sends output reports to the remote, so that the input thread never blocks on HID writes:
+# - LED/rumble state is coalesced, only real changes are sent, at most every MIN_INTERVAL
+# - other reports are sent in order; register writes wait for their acknowledgement (0x22)
+# with threaded=False, the owner calls pump() instead (e.g. from an asyncio event loop)
+
+REPORT_LEDS         = 0x11 # OutputReport.LEDs
+REPORT_WRITE_MEMORY = 0x16 # OutputReport.WriteMemory, acknowledged by InputReport.AcknowledgeResult
+
+class OutputReportWriter:
+	MIN_INTERVAL = 0.05 # seconds between two LED/rumble reports
+	ACK_TIMEOUT  = 0.1  # seconds to wait for the acknowledgement of a register write
+
+	def __init__(self, dev, threaded=True):
+		self.dev = dev
+		self.queue = collections.deque() # (packet, wait for acknowledgement)
+		self.leds = None # unknown until set, nothing is sent before
+		self.rumble = 0
+		self.sentState = None
+		self.nextStateWrite = 0.0
+		self.pendingAck = None
+		self.ackDeadline = 0.0
+		self.closed = False
+		# metrics
+		self.written = 0
+		self.coalesced = 0
+		self.ackTimeouts = 0
+		self.condition = threading.Condition()
+		self.thread = None
+		if(threaded):
+			self.thread = threading.Thread(target=self.__loop, daemon=True)
+			self.thread.start()
+
+	def send(self, packet):
+		self.sendBatch([packet])
+
+	def sendBatch(self, packets):
+		# packets are sent in this order, without other queued reports in between
+		with self.condition:
+			self.queue.extend((bytes(p), p[0] == REPORT_WRITE_MEMORY) for p in packets)
+			self.condition.notify()
+
+	def setLeds(self, leds):
+		with self.condition:
+			if(leds == self.leds): return
+			if(self.leds is not None and (self.leds | self.rumble) != self.sentState):
+				# replaces a value which was not sent yet
+				self.coalesced += 1
+			self.leds = leds
+			self.condition.notify()
+
+	def setRumble(self, on):
+		with self.condition:
+			self.rumble = 0x01 if on else 0x00
+			self.condition.notify()
+
+	def acknowledge(self, report, error):
+		# called with the content of an AcknowledgeResult input report
+		with self.condition:
+			if(error):
+				print('Output report {:#04x} failed with error {}'.format(report, error))
+			if(report == self.pendingAck):
+				self.pendingAck = None
+				self.condition.notify()
+
+	def close(self):
+		with self.condition:
+			self.closed = True
+			self.condition.notify()
+
+	def pump(self):
+		# sends everything which is due; returns the seconds until pump() should be called again,
+		# or None if nothing is pending
+		while True:
+			with self.condition:
+				packet, wait = self.__next(time.monotonic())
+			if(packet is None): return wait
+			self.__write(packet)
+
+	def __loop(self):
+		while True:
+			with self.condition:
+				while True:
+					if(self.closed): return
+					packet, wait = self.__next(time.monotonic())
+					if(packet is not None): break
+					self.condition.wait(wait)
+			self.__write(packet)
+
+	def __next(self, now):
+		# returns (packet, None) if a packet is due, otherwise (None, seconds to wait or None)
+		if(self.closed):
+			return None, None
+		if(self.pendingAck is not None):
+			if(now < self.ackDeadline):
+				return None, self.ackDeadline - now
+			# no acknowledgement (e.g. a replayed capture), continue anyway
+			self.pendingAck = None
+			self.ackTimeouts += 1
+		if(self.queue):
+			packet, waitForAck = self.queue.popleft()
+			if(waitForAck):
+				self.pendingAck = packet[0]
+				self.ackDeadline = now + self.ACK_TIMEOUT
+			# the rumble bit is part of every output report
+			return bytes([packet[0], packet[1] | self.rumble]) + packet[2:], None
+		if(self.leds is not None):
+			state = self.leds | self.rumble
+			if(state != self.sentState):
+				if(now < self.nextStateWrite):
+					return None, self.nextStateWrite - now
+				self.sentState = state
+				self.nextStateWrite = now + self.MIN_INTERVAL
+				return bytes([REPORT_LEDS, state]), None
+		return None, None
+
+	def __write(self, packet):
+		#print('<==', packet.hex())
+		try:
+			self.dev.write(packet)
+			self.written += 1
+		except Exception as e:
+			# the device is gone, the reader notices the disconnect
+			pass
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import math
+
+# pointer filters for the whiteboard mode
+# every filter takes raw (unsmoothed) positions and the report timestamp in seconds,
+# and works in O(1) per report without allocating
+
+class RingBuffer:
+	def __init__(self, size):
+		self.size = max(1, int(size))
+		self.values = [0.0] * self.size
+		self.index = 0
+		self.count = 0
+		self.sum = 0.0
+
+	def push(self, value):
+		# keeps a running sum, so the mean is available without iterating
+		if(self.count == self.size):
+			self.sum -= self.values[self.index]
+		else:
+			self.count += 1
+		self.values[self.index] = value
+		self.sum += value
+		self.index = (self.index + 1) % self.size
+
+	def mean(self):
+		return self.sum / self.count if self.count else 0.0
+
+	def clear(self):
+		self.index = 0
+		self.count = 0
+		self.sum = 0.0
+
+class NoFilter:
+	def filter(self, x, y, t):
+		return x, y
+
+	def reset(self):
+		pass
+
+class MovingAverageFilter:
+	def __init__(self, size=4):
+		self.bufferX = RingBuffer(size)
+		self.bufferY = RingBuffer(size)
+
+	def filter(self, x, y, t):
+		self.bufferX.push(x)
+		self.bufferY.push(y)
+		return self.bufferX.mean(), self.bufferY.mean()
+
+	def reset(self):
+		self.bufferX.clear()
+		self.bufferY.clear()
+
+class ExponentialFilter:
+	def __init__(self, alpha=0.5):
+		self.alpha = alpha
+		self.x = None
+		self.y = None
+
+	def filter(self, x, y, t):
+		if(self.x is None):
+			self.x = x; self.y = y
+		else:
+			self.x += self.alpha * (x - self.x)
+			self.y += self.alpha * (y - self.y)
+		return self.x, self.y
+
+	def reset(self):
+		self.x = None
+		self.y = None
+
+class OneEuroFilter:
+	# Casiez et al.: low pass filter whose cutoff frequency increases with speed,
+	# i.e. strong smoothing while the pen rests and almost no lag while it moves
+	def __init__(self, minCutoff=1.0, beta=0.05, dCutoff=1.0):
+		self.minCutoff = minCutoff
+		self.beta = beta
+		self.dCutoff = dCutoff
+		self.reset()
+
+	def reset(self):
+		self.t = None
+		self.x = self.y = 0.0
+		self.dx = self.dy = 0.0
+
+	@staticmethod
+	def alpha(cutoff, dt):
+		tau = 1.0 / (2 * math.pi * cutoff)
+		return 1.0 / (1.0 + tau / dt)
+
+	def filter(self, x, y, t):
+		if(self.t is None or t <= self.t):
+			if(self.t is None):
+				self.x = x; self.y = y
+			self.t = t
+			return self.x, self.y
+		dt = t - self.t
+		self.t = t
+
+		# filtered derivative
+		ad = self.alpha(self.dCutoff, dt)
+		self.dx += ad * ((x - self.x) / dt - self.dx)
+		self.dy += ad * ((y - self.y) / dt - self.dy)
+
+		# position with speed dependent cutoff
+		speed = math.sqrt(self.dx * self.dx + self.dy * self.dy)
+		a = self.alpha(self.minCutoff + self.beta * speed, dt)
+		self.x += a * (x - self.x)
+		self.y += a * (y - self.y)
+		return self.x, self.y
+
+class KalmanFilter:
+	# constant velocity model, x and y are filtered independently
+	def __init__(self, processNoise=100000.0, measurementNoise=4.0):
+		self.q = processNoise
+		self.r = measurementNoise
+		self.reset()
+
+	def reset(self):
+		self.t = None
+		# state [position, velocity] and covariance [[p00, p01], [p01, p11]] per axis
+		self.axes = [[0.0, 0.0, 0.0, 0.0, 0.0], [0.0, 0.0, 0.0, 0.0, 0.0]]
+
+	def filter(self, x, y, t):
+		if(self.t is None):
+			self.t = t
+			self.axes = [[x, 0.0, self.r, 0.0, self.q], [y, 0.0, self.r, 0.0, self.q]]
+			return x, y
+		dt = max(t - self.t, 1e-4)
+		self.t = t
+		return self._update(self.axes[0], x, dt), self._update(self.axes[1], y, dt)
+
+	def _update(self, a, z, dt):
+		pos, vel, p00, p01, p11 = a
+		# predict
+		pos += vel * dt
+		q = self.q
+		p00 += dt * (2 * p01 + dt * p11) + q * dt**3 / 3
+		p01 += dt * p11 + q * dt**2 / 2
+		p11 += q * dt
+		# correct
+		s = p00 + self.r
+		k0 = p00 / s
+		k1 = p01 / s
+		innovation = z - pos
+		pos += k0 * innovation
+		vel += k1 * innovation
+		p11 -= k1 * p01
+		p01 -= k0 * p01
+		p00 -= k0 * p00
+		a[0] = pos; a[1] = vel; a[2] = p00; a[3] = p01; a[4] = p11
+		return pos
+
+FILTERS = ['none', 'average', 'exponential', 'oneeuro', 'kalman']
+
+def createFilter(config):
+	# config: dict of the [activeboard] config section
+	# a config with only "smoothing" (older versions, which had the moving average only) keeps it
+	name = config.get('filter', 'average' if 'smoothing' in config else 'oneeuro')
+	if(name == 'none'):
+		return NoFilter()
+	elif(name == 'average'):
+		return MovingAverageFilter(int(config.get('smoothing', 4)))
+	elif(name == 'exponential'):
+		return ExponentialFilter(float(config.get('filter-alpha', 0.5)))
+	elif(name == 'oneeuro'):
+		return OneEuroFilter(
+			float(config.get('filter-mincutoff', 1.0)),
+			float(config.get('filter-beta', 0.05)),
+			float(config.get('filter-dcutoff', 1.0)),
+		)
+	elif(name == 'kalman'):
+		return KalmanFilter(
+			float(config.get('filter-processnoise', 100000.0)),
+			float(config.get('filter-measurementnoise', 4.0)),
+		)
+	raise ValueError(f'Unknown filter "{name}", use one of: '+', '.join(FILTERS))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import time
+
+# latency histogram with fixed buckets (4 per power of two nanoseconds),
+# adding a value is a few integer operations and never allocates
+class Histogram:
+	BUCKETS = 128
+
+	def __init__(self):
+		self.counts = [0] * self.BUCKETS
+		self.count = 0
+		self.total = 0
+		self.max = 0
+
+	@staticmethod
+	def bucketIndex(ns):
+		if(ns < 4): return max(0, ns)
+		bl = ns.bit_length()
+		return (bl - 2) * 4 + ((ns >> (bl - 3)) & 3)
+
+	@staticmethod
+	def bucketLimit(index):
+		# upper limit (exclusive) of a bucket in nanoseconds
+		if(index < 4): return index + 1
+		return (5 + index % 4) << (index // 4 - 1)
+
+	def add(self, ns):
+		i = self.bucketIndex(ns)
+		if(i >= self.BUCKETS): i = self.BUCKETS - 1
+		self.counts[i] += 1
+		self.count += 1
+		self.total += ns
+		if(ns > self.max): self.max = ns
+
+	def percentile(self, p):
+		if(not self.count): return 0
+		target = p / 100 * self.count
+		cumulative = 0
+		for i, c in enumerate(self.counts):
+			cumulative += c
+			if(cumulative >= target):
+				return min(self.bucketLimit(i), self.max)
+		return self.max
+
+	def clear(self):
+		self.counts = [0] * self.BUCKETS
+		self.count = 0
+		self.total = 0
+		self.max = 0
+
+	def summary(self):
+		# values in microseconds
+		return {
+			'count': self.count,
+			'mean': self.total / self.count / 1000 if self.count else 0,
+			'p50': self.percentile(50) / 1000,
+			'p99': self.percentile(99) / 1000,
+			'max': self.max / 1000,
+		}
+
+class ControllerStats:
+	# read = time a report waited in the queue, inject = output backend calls,
+	# dispatch = complete processing of a data report
+	STAGES = ['read', 'parse', 'warp', 'smooth', 'inject', 'dispatch']
+
+	def __init__(self):
+		self.histograms = {stage: Histogram() for stage in self.STAGES}
+		self.reports = 0
+		self.reportsPerSecond = 0.0
+		self.windowStart = time.monotonic()
+		self.windowReports = 0
+
+	def add(self, stage, ns):
+		self.histograms[stage].add(ns)
+
+	def countReport(self, now):
+		self.reports += 1
+		self.windowReports += 1
+		elapsed = now - self.windowStart
+		if(elapsed >= 1.0):
+			self.reportsPerSecond = self.windowReports / elapsed
+			self.windowStart = now
+			self.windowReports = 0
+
+	def clear(self):
+		for histogram in self.histograms.values():
+			histogram.clear()
+
+	def snapshot(self, controller=None):
+		result = {
+			'reports': self.reports,
+			'reportsPerSecond': self.reportsPerSecond,
+			'stages': {stage: h.summary() for stage, h in self.histograms.items()},
+		}
+		if(controller):
+			result['unsupported'] = controller.unsupportedReports
+			result.update(controller.queueMetrics())
+		return result
+
+def formatStats(snapshot):
+	text = '{:.0f} reports/s'.format(snapshot['reportsPerSecond'])
+	if('dropped' in snapshot):
+		text += ', dropped {}, unchanged {}, unsupported {}, queue max {}, writes {} ({} coalesced)'.format(
+			snapshot['dropped'], snapshot['unchanged'], snapshot['unsupported'], snapshot['maxDepth'],
+			snapshot['written'], snapshot['coalesced']
+		)
+	for stage, s in snapshot['stages'].items():
+		if(not s['count']): continue
+		text += ' | {} p50 {:.0f}µs p99 {:.0f}µs'.format(stage, s['p50'], s['p99'])
+	return text
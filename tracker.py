@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+# assigns persistent IDs to the IR blobs of consecutive reports; the camera reorders its
+# 4 slots when blobs appear or vanish, so slot numbers cannot be used as identity
+# blobs are matched to the predicted track positions (constant velocity), nearest first
+
+class Track:
+	__slots__ = ('id', 'x', 'y', 'vx', 'vy', 't', 'age')
+
+	def __init__(self, id, x, y, t):
+		self.id = id
+		self.x = x
+		self.y = y
+		self.vx = 0.0
+		self.vy = 0.0
+		self.t = t
+		self.age = 0 # number of reports the blob was tracked before this one
+
+class IrTracker:
+	MAX_DISTANCE    = 120   # max. camera pixels between prediction and blob to keep the identity
+	VELOCITY_WEIGHT = 0.5   # weight of the newest velocity measurement
+	MAX_ID          = 0xffff
+
+	def __init__(self):
+		self.tracks = []
+		self.nextId = 0
+
+	def reset(self):
+		self.tracks = []
+
+	def update(self, points, t):
+		# points: list of (x, y) camera coordinates of the visible blobs
+		# returns the tracks of all visible blobs, the oldest (usually the pen) first
+		tracks = self.tracks
+		if(not points):
+			if(tracks): self.tracks = []
+			return self.tracks
+
+		# all track/blob pairs within reach, nearest first
+		maxDistance = self.MAX_DISTANCE * self.MAX_DISTANCE
+		pairs = []
+		for i, track in enumerate(tracks):
+			dt = t - track.t
+			px = track.x + track.vx * dt
+			py = track.y + track.vy * dt
+			for j, (x, y) in enumerate(points):
+				distance = (x - px) * (x - px) + (y - py) * (y - py)
+				if(distance <= maxDistance): pairs.append((distance, i, j))
+		pairs.sort()
+		matches = [None] * len(points)
+		matchedTracks = set()
+		for distance, i, j in pairs:
+			if(i in matchedTracks or matches[j] is not None): continue
+			matches[j] = tracks[i]
+			matchedTracks.add(i)
+
+		result = []
+		weight = self.VELOCITY_WEIGHT
+		for j, (x, y) in enumerate(points):
+			track = matches[j]
+			if(track is None):
+				track = Track(self.nextId, x, y, t)
+				self.nextId = (self.nextId + 1) & self.MAX_ID
+			else:
+				dt = t - track.t
+				if(dt > 0):
+					track.vx += ((x - track.x) / dt - track.vx) * weight
+					track.vy += ((y - track.y) / dt - track.vy) * weight
+				track.x = x
+				track.y = y
+				track.t = t
+				track.age += 1
+			result.append(track)
+		result.sort(key=lambda track: -track.age)
+		self.tracks = result
+		return result
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+import threading
+import time
+
+# changes the ALSA master volume in a separate thread, so the input thread is never blocked
+# by the mixer; rapid presses are coalesced and a held button repeats
+class VolumeController:
+	STEP            = 2    # percent per press
+	REPEAT_DELAY    = 0.5  # seconds until a held button starts repeating
+	REPEAT_INTERVAL = 0.1  # seconds between repeats
+
+	def __init__(self, mixerName='Master'):
+		self.mixerName = mixerName
+		self.mixer = None
+		self.pendingDelta = 0
+		self.heldDelta = 0
+		self.nextRepeat = None
+		self.condition = threading.Condition()
+		self.thread = threading.Thread(target=self.__loop, daemon=True)
+		self.thread.start()
+
+	def press(self, direction):
+		# direction: +1 or -1; called from the input thread, does not block
+		with self.condition:
+			self.pendingDelta += direction * self.STEP
+			self.heldDelta = direction * self.STEP
+			self.nextRepeat = time.monotonic() + self.REPEAT_DELAY
+			self.condition.notify()
+
+	def release(self):
+		with self.condition:
+			self.heldDelta = 0
+			self.nextRepeat = None
+			self.condition.notify()
+
+	def __openMixer(self):
+		# the mixer handle is opened once and kept
+		if(self.mixer is None):
+			import alsaaudio
+			self.mixer = alsaaudio.Mixer(self.mixerName)
+		return self.mixer
+
+	def __loop(self):
+		while True:
+			with self.condition:
+				while True:
+					now = time.monotonic()
+					if(self.nextRepeat is not None and now >= self.nextRepeat):
+						self.pendingDelta += self.heldDelta
+						self.nextRepeat = now + self.REPEAT_INTERVAL
+					if(self.pendingDelta): break
+					self.condition.wait(None if self.nextRepeat is None else self.nextRepeat - now)
+				delta = self.pendingDelta
+				self.pendingDelta = 0
+
+			# all presses since the last change are applied in one step
+			try:
+				mixer = self.__openMixer()
+				volume = mixer.getvolume()[0]
+				mixer.setvolume(min(100, max(0, volume + delta)))
+			except Exception as e:
+				print('Unable to change volume:', e)
+				self.mixer = None
@@ -1,153 +1,202 @@
 #!/usr/bin/env python3
 # *-* coding: utf-8 *-*
 
+import math
+
+numpy = None
+numpyChecked = False
+
+def loadNumpy():
+	# numpy is optional and only imported on first use (it is slow to import)
+	global numpy, numpyChecked
+	if(not numpyChecked):
+		numpyChecked = True
+		try:
+			import numpy as module
+			numpy = module
+		except ImportError:
+			pass
+	return numpy
+
+# projective transformation (homography) from N >= 4 source points to N destination points
+# 4 points are mapped exactly, more points (e.g. a 3x3 or 4x4 calibration grid) are fitted by least squares
 class warper:
-	srcX = [0, 1, 0, 1]
-	srcY = [0, 0, 1, 1]
-	dstX = [0, 1, 0, 1]
-	dstY = [0, 0, 1, 1]
-	srcMat  = [0] * 16
-	dstMat  = [0] * 16
-	warpMat = [0] * 16
-	computed = False
+	# max. RMS reprojection error of a valid calibration, as fraction of the diagonal of the destination
+	# points (1% = 20 px for the targets on a 1920x1080 screen), but at least MAX_RESIDUAL (pixels)
+	MAX_RESIDUAL_RATIO = 0.01
+	MAX_RESIDUAL = 10.0
+	# pivot threshold for the (normalized) linear system, below the points are considered degenerate
+	EPSILON = 1e-9
+	# below this number of points, the pure python batch path is faster than numpy
+	NUMPY_MIN_POINTS = 32
 
-	def setSource(self, x0, y0, x1, y1, x2, y2, x3, y3):
-		self.srcX[0] = x0
-		self.srcY[0] = y0
-		self.srcX[1] = x1
-		self.srcY[1] = y1
-		self.srcX[2] = x2
-		self.srcY[2] = y2
-		self.srcX[3] = x3
-		self.srcY[3] = y3
+	def __init__(self):
+		self.srcPoints = [(0, 0), (1, 0), (0, 1), (1, 1)]
+		self.dstPoints = [(0, 0), (1, 0), (0, 1), (1, 1)]
+		# 3x3 matrix, row-major, last element is always 1
+		self.warpMat = (1, 0, 0, 0, 1, 0, 0, 0, 1)
+		self.residual = 0.0
 		self.computed = False
+		self.maxResidualRatio = self.MAX_RESIDUAL_RATIO
+
+	def setSource(self, x0, y0, x1, y1, x2, y2, x3, y3):
+		self.setSourcePoints([(x0, y0), (x1, y1), (x2, y2), (x3, y3)])
 
 	def setDestination(self, x0, y0, x1, y1, x2, y2, x3, y3):
-		self.dstX[0] = x0
-		self.dstY[0] = y0
-		self.dstX[1] = x1
-		self.dstY[1] = y1
-		self.dstX[2] = x2
-		self.dstY[2] = y2
-		self.dstX[3] = x3
-		self.dstY[3] = y3
+		self.setDestinationPoints([(x0, y0), (x1, y1), (x2, y2), (x3, y3)])
+
+	def setSourcePoints(self, points):
+		self.srcPoints = [(float(p[0]), float(p[1])) for p in points]
+		self.computed = False
+
+	def setDestinationPoints(self, points):
+		self.dstPoints = [(float(p[0]), float(p[1])) for p in points]
 		self.computed = False
 
 	def computeWarp(self):
-		self.srcMat = self.computeQuadToSquare(
-			self.srcX[0], self.srcY[0],
-			self.srcX[1], self.srcY[1],
-			self.srcX[2], self.srcY[2],
-			self.srcX[3], self.srcY[3]
-		)
-		self.dstMat = self.computeSquareToQuad(
-			self.dstX[0], self.dstY[0],
-			self.dstX[1], self.dstY[1],
-			self.dstX[2], self.dstY[2],
-			self.dstX[3], self.dstY[3]
-		)
-		self.multMats()
+		if(len(self.srcPoints) != len(self.dstPoints)):
+			raise ValueError('Number of source and destination points differs')
+		if(len(self.srcPoints) < 4):
+			raise ValueError('At least 4 points are necessary')
+
+		# normalize both point sets for numerical stability (Hartley)
+		srcT = normalization(self.srcPoints)
+		dstT = normalization(self.dstPoints)
+
+		# direct linear transformation with h33 = 1, solved via normal equations
+		ata = [[0.0] * 8 for i in range(8)]
+		atb = [0.0] * 8
+		for (x, y), (u, v) in zip(self.srcPoints, self.dstPoints):
+			x = x * srcT[0] + srcT[1]; y = y * srcT[0] + srcT[2]
+			u = u * dstT[0] + dstT[1]; v = v * dstT[0] + dstT[2]
+			for row, rhs in (
+				((x, y, 1.0, 0.0, 0.0, 0.0, -u*x, -u*y), u),
+				((0.0, 0.0, 0.0, x, y, 1.0, -v*x, -v*y), v),
+			):
+				for i in range(8):
+					if(row[i] == 0.0): continue
+					atb[i] += row[i] * rhs
+					ataRow = ata[i]
+					for j in range(8):
+						ataRow[j] += row[i] * row[j]
+		h = solveLinear(ata, atb, self.EPSILON)
+
+		# denormalize: H = inv(dstT) * Hn * srcT
+		s, tx, ty = srcT
+		a, b, c, d, e, f, g, k = h
+		m = [
+			a*s, b*s, a*tx + b*ty + c,
+			d*s, e*s, d*tx + e*ty + f,
+			g*s, k*s, g*tx + k*ty + 1.0,
+		]
+		ds, dtx, dty = dstT
+		for i in range(3):
+			m[i]   = (m[i] - dtx * m[6+i]) / ds
+			m[3+i] = (m[3+i] - dty * m[6+i]) / ds
+		if(abs(m[8]) < self.EPSILON):
+			raise ValueError('Calibration points are degenerate')
+		m = [v / m[8] for v in m]
+
+		# all source points must be on the same side of the horizon line
+		# (otherwise the quad is twisted or points are nearly collinear)
+		sign = None
+		for x, y in self.srcPoints:
+			w = m[6]*x + m[7]*y + 1.0
+			if(abs(w) < self.EPSILON or (sign is not None and (w > 0) != sign)):
+				raise ValueError('Calibration points are degenerate')
+			sign = w > 0
+
+		# RMS reprojection error
+		error = 0.0
+		for (x, y), (u, v) in zip(self.srcPoints, self.dstPoints):
+			rx, ry = self._warp(m, x, y)
+			error += (rx - u)**2 + (ry - v)**2
+		residual = math.sqrt(error / len(self.srcPoints))
+		maxResidual = self.maxResidual()
+		if(residual > maxResidual):
+			raise ValueError(f'Calibration residual error too high ({residual:.1f}, max. {maxResidual:.1f})')
+
+		self.warpMat = tuple(m)
+		self.residual = residual
 		self.computed = True
 
-	def multMats(self):
-		for r in range(0, 4):
-			ri = r * 4
-			for c in range(0, 4):
-				self.warpMat[ri + c] = (
-					self.srcMat[ri] * self.dstMat[c]
-					+ self.srcMat[ri + 1] * self.dstMat[c + 4]
-					+ self.srcMat[ri + 2] * self.dstMat[c + 8]
-					+ self.srcMat[ri + 3] * self.dstMat[c + 12]
-				)
-
-	def computeSquareToQuad(self, x0, y0, x1, y1, x2, y2, x3, y3):
-		dx1 = x1 - x2; dy1 = y1 - y2
-		dx2 = x3 - x2; dy2 = y3 - y2
-		sx = x0 - x1 + x2 - x3
-		sy = y0 - y1 + y2 - y3
-		g = (sx * dy2 - dx2 * sy) / (dx1 * dy2 - dx2 * dy1)
-		h = (dx1 * sy - sx * dy1) / (dx1 * dy2 - dx2 * dy1)
-		a = x1 - x0 + g * x1
-		b = x3 - x0 + h * x3
-		c = x0
-		d = y1 - y0 + g * y1
-		e = y3 - y0 + h * y3
-		f = y0
-
-		mat = [0] * 16
-		mat[0] = a
-		mat[1] = d
-		mat[2] = 0
-		mat[3] = g
-		mat[4] = b
-		mat[5] = e
-		mat[6] = 0
-		mat[7] = h
-		mat[8] = 0
-		mat[9] = 0
-		mat[10] = 1
-		mat[11] = 0
-		mat[12] = c
-		mat[13] = f
-		mat[14] = 0
-		mat[15] = 1
-		return mat
-
-	def computeQuadToSquare(self, x0, y0, x1, y1, x2, y2, x3, y3):
-		mat = self.computeSquareToQuad(x0, y0, x1, y1, x2, y2, x3, y3)
-		# invert through adjoint
-
-		# ignore
-		a__1 = mat[0]; d__2 = mat[1]; g__3 = mat[3]
-		# 3rd col
-		b__4 = mat[4]; e__5 = mat[5]; h__6 = mat[7]
-		# ignore 3rd row
-
-		c__7 = mat[12]; f__8 = mat[13]
-
-		A__9 = e__5 - f__8 * h__6
-		B__10 = c__7 * h__6 - b__4
-		C__11 = b__4 * f__8 - c__7 * e__5
-		D__12 = f__8 * g__3 - d__2
-		E__13 = a__1 - c__7 * g__3
-		F__14 = c__7 * d__2 - a__1 * f__8
-		G__15 = d__2 * h__6 - e__5 * g__3
-		H__16 = b__4 * g__3 - a__1 * h__6
-		I = a__1 * e__5 - b__4 * d__2
-
-		# Probably unnecessary since 'I' is also scaled by the determinant,
-		#   and 'I' scales the homogeneous coordinate, which, in turn,
-		#   scales the X,Y coordinates.
-		# Determinant  =   a * (e - f * h) + b * (f * g - d) + c * (d * h - e * g);
-		idet = 1.0 / (a__1 * A__9 + b__4 * D__12 + c__7 * G__15)
-
-		mat[0] = A__9 * idet
-		mat[1] = D__12 * idet
-		mat[2] = 0
-		mat[3] = G__15 * idet
-		mat[4] = B__10 * idet
-		mat[5] = E__13 * idet
-		mat[6] = 0
-		mat[7] = H__16 * idet
-		mat[8] = 0
-		mat[9] = 0
-		mat[10] = 1
-		mat[11] = 0
-		mat[12] = C__11 * idet
-		mat[13] = F__14 * idet
-		mat[14] = 0
-		mat[15] = I * idet
-		return mat
+	def maxResidual(self):
+		xs = [p[0] for p in self.dstPoints]
+		ys = [p[1] for p in self.dstPoints]
+		return max(self.MAX_RESIDUAL, self.maxResidualRatio * math.hypot(max(xs) - min(xs), max(ys) - min(ys)))
+
+	def setWarp(self, mat, residual=0.0):
+		# a matrix computed before (e.g. cached in the config file) for the current points
+		if(len(mat) != 9 or abs(mat[8]) < self.EPSILON):
+			raise ValueError('Invalid warp matrix')
+		self.warpMat = tuple(v / mat[8] for v in mat)
+		self.residual = residual
+		self.computed = True
 
 	def warp(self, srcX, srcY):
 		if not self.computed: self.computeWarp()
 		return self._warp(self.warpMat, srcX, srcY)
 
+	def warpMany(self, points):
+		# warp a batch of (x, y) points, e.g. all IR dots of several reports;
+		# numpy arrays (N x 2) are returned as numpy arrays, everything else as list of tuples
+		if not self.computed: self.computeWarp()
+		np = loadNumpy()
+		if(np is not None and (len(points) >= self.NUMPY_MIN_POINTS or isinstance(points, np.ndarray))):
+			return self._warpNumpy(self.warpMat, points)
+		return self._warpMany(self.warpMat, points)
+
+	def _warpMany(self, mat, points):
+		a, b, c, d, e, f, g, h, i = mat
+		result = []
+		append = result.append
+		for x, y in points:
+			w = x * g + y * h + i
+			append(((x * a + y * b + c) / w, (x * d + y * e + f) / w))
+		return result
+
+	def _warpNumpy(self, mat, points):
+		isArray = isinstance(points, numpy.ndarray)
+		p = numpy.asarray(points, dtype=numpy.float64)
+		m = numpy.array(mat, dtype=numpy.float64).reshape(3, 3)
+		r = p @ m[:, :2].T + m[:, 2]
+		r = r[:, :2] / r[:, 2:3]
+		return r if isArray else [tuple(v) for v in r.tolist()]
+
 	def _warp(self, mat, srcX, srcY):
-		result = [0] * 4
-		z = 0
-		result[0] = (srcX * mat[0] + srcY * mat[4] + z * mat[8] + 1 * mat[12])
-		result[1] = (srcX * mat[1] + srcY * mat[5] + z * mat[9] + 1 * mat[13])
-		result[2] = (srcX * mat[2] + srcY * mat[6] + z * mat[10] + 1 * mat[14])
-		result[3] = (srcX * mat[3] + srcY * mat[7] + z * mat[11] + 1 * mat[15])
-		return result[0] / result[3], result[1] / result[3]
+		w = srcX * mat[6] + srcY * mat[7] + mat[8]
+		return (
+			(srcX * mat[0] + srcY * mat[1] + mat[2]) / w,
+			(srcX * mat[3] + srcY * mat[4] + mat[5]) / w
+		)
+
+def normalization(points):
+	# similarity transform (scale, translation x, translation y) moving the centroid
+	# to the origin and scaling the mean distance to sqrt(2)
+	cx = sum(p[0] for p in points) / len(points)
+	cy = sum(p[1] for p in points) / len(points)
+	meanDist = sum(math.hypot(p[0] - cx, p[1] - cy) for p in points) / len(points)
+	if(meanDist == 0):
+		raise ValueError('Calibration points are degenerate')
+	s = math.sqrt(2) / meanDist
+	return (s, -s * cx, -s * cy)
+
+def solveLinear(a, b, epsilon):
+	# gaussian elimination with partial pivoting (modifies a and b)
+	n = len(b)
+	for col in range(n):
+		pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+		if(abs(a[pivot][col]) < epsilon):
+			raise ValueError('Calibration points are degenerate')
+		a[col], a[pivot] = a[pivot], a[col]
+		b[col], b[pivot] = b[pivot], b[col]
+		for r in range(col + 1, n):
+			factor = a[r][col] / a[col][col]
+			if(factor == 0.0): continue
+			for c in range(col, n):
+				a[r][c] -= factor * a[col][c]
+			b[r] -= factor * b[col]
+	x = [0.0] * n
+	for r in range(n - 1, -1, -1):
+		x[r] = (b[r] - sum(a[r][c] * x[c] for c in range(r + 1, n))) / a[r][r]
+	return x
@@ -2,15 +2,24 @@
 # *-* coding: utf-8 *-*
 
 import threading
-import hid
+import queue
+import time
 import struct
-import pyautogui
-import configparser
 from pathlib import Path
-import alsaaudio
-import traceback
 
 from warper import warper
+from smoothing import createFilter
+from output import createBackend
+from volume import VolumeController
+from motionplus import MotionPlus
+from accelerometer import Accelerometer
+from memory import MemoryReader
+from reportwriter import OutputReportWriter
+from tracker import IrTracker
+from mapping import ButtonMapping, GestureDetector, loadBindings
+from stats import ControllerStats, formatStats
+from capture import CaptureWriter
+from config import configStore
 
 
 IDs = [
@@ -41,6 +50,8 @@ class InputReport:
 	ButtonsAccelExtension   = 0x35
 	ButtonsIrExtension      = 0x36
 	ButtonsAccelIrExtension = 0x37
+	ButtonsAccelIrFull1     = 0x3E # interleaved with 0x3F
+	ButtonsAccelIrFull2     = 0x3F
 
 class Register:
 	IR                    = 0x4B00030
@@ -51,11 +62,15 @@ class Register:
 	EXTENSION_INIT_2      = 0x4A400FB
 	MOTIONPLUS_INIT_1     = 0x4A600F0
 	MOTIONPLUS_INIT_2     = 0x4A600FE
+	EXTENSION_ID          = 0x4A400FA # 6 bytes, see EXTENSION_IDS
+	MOTIONPLUS_ID         = 0x4A600FA # of an inactive MotionPlus
 
 	EXTENSION_INIT_1_VAL  = 0x55
 	EXTENSION_INIT_2_VAL  = 0x00
 	MOTIONPLUS_INIT_1_VAL = 0x55
-	MOTIONPLUS_INIT_2_VAL = 0x04
+	MOTIONPLUS_INIT_2_VAL = 0x04 # MotionPlus only
+	MOTIONPLUS_INIT_2_NUNCHUK = 0x05 # passthrough of a Nunchuk
+	MOTIONPLUS_INIT_2_CLASSIC = 0x07 # passthrough of a Classic Controller
 
 class LEDs:
 	Rumble  = 0x01
@@ -64,6 +79,29 @@ class LEDs:
 	Player3 = 0x40
 	Player4 = 0x80
 
+PLAYER_LEDS = [LEDs.Player1, LEDs.Player2, LEDs.Player3, LEDs.Player4]
+
+class NunchukButtons:
+	Z = 0x01
+	C = 0x02
+
+class ClassicButtons:
+	Up    = 0x0001
+	Left  = 0x0002
+	ZR    = 0x0004
+	X     = 0x0008
+	A     = 0x0010
+	Y     = 0x0020
+	B     = 0x0040
+	ZL    = 0x0080
+	R     = 0x0200
+	Plus  = 0x0400
+	Home  = 0x0800
+	Minus = 0x1000
+	L     = 0x2000
+	Down  = 0x4000
+	Right = 0x8000
+
 class IrValue:
 	Max = 1023
 	Min = 0
@@ -77,6 +115,8 @@ class IrMode:
 	Extended = 0x03 # position plus approx. object size
 	Full     = 0x05 # even more, read the docs
 
+IR_MODE_NAMES = {'basic': IrMode.Basic, 'extended': IrMode.Extended, 'full': IrMode.Full}
+
 class IrSensitivity:
 	Lv1  = [b'\x02\x00\x00\x71\x01\x00\x64\x00\xfe', b'\xfd\x05']
 	Lv2  = [b'\x02\x00\x00\x71\x01\x00\x96\x00\xb4', b'\xb3\x04']
@@ -86,92 +126,378 @@ class IrSensitivity:
 	Max  = [b'\x00\x00\x00\x00\x00\x00\x90\x00\x41', b'\x40\x00']
 
 class State:
-	btnLeft  = False
-	btnRight = False
-	btnDown  = False
-	btnUp    = False
-	btnPlus  = False
-	btnTwo   = False
-	btnOne   = False
-	btnB     = False
-	btnA     = False
-	btnMinus = False
-	btnHome  = False
-	x        = 0x80
-	y        = 0x80
-	z        = 0x80
-	ir1      = [0,0]
-	ir2      = [0,0]
-	ir3      = [0,0]
-	ir4      = [0,0]
-	found1   = False
-	found2   = False
-	found3   = False
-	found4   = False
-	yaw      = 0x1f7f
-	roll     = 0x1f7f
-	pitch    = 0x1f7f
+	__slots__ = (
+		'buttons',
+		'x', 'y', 'z', 'x10', 'y10', 'z10', 'gx', 'gy', 'gz',
+		'ir1', 'ir2', 'ir3', 'ir4',
+		'found1', 'found2', 'found3', 'found4', 'found',
+		'yaw', 'roll', 'pitch',
+		'yawFast', 'rollFast', 'pitchFast', 'motionPlusData',
+		'extButtons', 'stickX', 'stickY', 'stick2X', 'stick2Y', 'triggerL', 'triggerR', 'extX', 'extY', 'extZ',
+		'player',
+	)
+
+	def __init__(self):
+		self.buttons  = 0 # all buttons as one word, see mapping.BUTTONS
+		self.x        = 0x80
+		self.y        = 0x80
+		self.z        = 0x80
+		# 10 bit values (the 8 bit values plus LSBs from the button bytes) and in g (calibrated)
+		self.x10      = 0x200
+		self.y10      = 0x200
+		self.z10      = 0x200
+		self.gx       = 0.0
+		self.gy       = 0.0
+		self.gz       = 0.0
+		# x, y, size (extended/full IR mode), intensity (full IR mode)
+		self.ir1      = [0,0,0,0]
+		self.ir2      = [0,0,0,0]
+		self.ir3      = [0,0,0,0]
+		self.ir4      = [0,0,0,0]
+		self.found1   = False
+		self.found2   = False
+		self.found3   = False
+		self.found4   = False
+		self.found    = 0 # found1..4 as LED mask
+		self.yaw      = 0x1f7f
+		self.roll     = 0x1f7f
+		self.pitch    = 0x1f7f
+		self.yawFast  = 0
+		self.rollFast = 0
+		self.pitchFast = 0
+		self.motionPlusData = 0
+		# Nunchuk/Classic Controller: buttons (NunchukButtons/ClassicButtons), sticks scaled to 8 bit
+		# (stick2 = right stick of the Classic Controller), triggers (5 bit), Nunchuk accel (10 bit)
+		self.extButtons = 0
+		self.stickX   = 0x80
+		self.stickY   = 0x80
+		self.stick2X  = 0x80
+		self.stick2Y  = 0x80
+		self.triggerL = 0
+		self.triggerR = 0
+		self.extX     = 0x200
+		self.extY     = 0x200
+		self.extZ     = 0x200
+		self.player   = 0
+
+	def copy(self):
+		s = State()
+		for name in self.__slots__:
+			value = getattr(self, name)
+			setattr(s, name, list(value) if isinstance(value, list) else value)
+		return s
+
+	# single buttons, derived from the button word
+	btnLeft  = property(lambda self: self.buttons & 0x0100)
+	btnRight = property(lambda self: self.buttons & 0x0200)
+	btnDown  = property(lambda self: self.buttons & 0x0400)
+	btnUp    = property(lambda self: self.buttons & 0x0800)
+	btnPlus  = property(lambda self: self.buttons & 0x1000)
+	btnTwo   = property(lambda self: self.buttons & 0x0001)
+	btnOne   = property(lambda self: self.buttons & 0x0002)
+	btnB     = property(lambda self: self.buttons & 0x0004)
+	btnA     = property(lambda self: self.buttons & 0x0008)
+	btnMinus = property(lambda self: self.buttons & 0x0010)
+	btnHome  = property(lambda self: self.buttons & 0x0080)
+
+# lookup tables for the 2 high bits of the 10 bit IR coordinates, indexed by
+# the shared "high bits" byte; IR_HI[n] extracts bits (2n+1, 2n) already shifted by 8
+IR_HI = tuple(tuple(((b >> (n*2)) & 0x03) << 8 for b in range(256)) for n in range(4))
+# lookup table for the 6 high bits of the 14 bit MotionPlus values
+MP_HI = tuple(((b >> 2) & 0x3f) << 8 for b in range(256))
 
 def parseButtons(d, s=State()):
-	s.btnLeft  = d[1] & 0x01
-	s.btnRight = d[1] & 0x02
-	s.btnDown  = d[1] & 0x04
-	s.btnUp    = d[1] & 0x08
-	s.btnPlus  = d[1] & 0x10
-	s.btnTwo   = d[2] & 0x01
-	s.btnOne   = d[2] & 0x02
-	s.btnB     = d[2] & 0x04
-	s.btnA     = d[2] & 0x08
-	s.btnMinus = d[2] & 0x10
-	s.btnHome  = d[2] & 0x80
+	# core buttons as one word (the other bits carry accel LSBs)
+	s.buttons = ((d[1] << 8) | d[2]) & 0x1f9f
 	return s
 
-def parseAccel(d, s=State()):
-	s.x        = d[3]
-	s.y        = d[4]
-	s.z        = d[5]
+def parseAccel(d, s=State(), o=3):
+	s.x        = d[o]
+	s.y        = d[o+1]
+	s.z        = d[o+2]
+	# LSBs in the button bytes: x bits 1-0, y and z only bit 1
+	s.x10      = (d[o] << 2)   | ((d[1] >> 5) & 0x03)
+	s.y10      = (d[o+1] << 2) | ((d[2] >> 4) & 0x02)
+	s.z10      = (d[o+2] << 2) | ((d[2] >> 5) & 0x02)
 	return s
 
-def parseIr(d, s=State()):
-	s.ir1 = [
-		d[6]  | ((d[8]  >> 4) & 0x03) << 8,
-		d[7]  | ((d[8]  >> 6) & 0x03) << 8
-	]
-	s.ir2 = [
-		d[9]  | ((d[8]  >> 0) & 0x03) << 8,
-		d[10] | ((d[8]  >> 2) & 0x03) << 8
-	]
-	s.ir3 = [
-		d[11] | ((d[13] >> 4) & 0x03) << 8,
-		d[12] | ((d[13] >> 6) & 0x03) << 8
-	]
-	s.ir4 = [
-		d[14] | ((d[13] >> 0) & 0x03) << 8,
-		d[15] | ((d[13] >> 2) & 0x03) << 8
-	]
+def updateFound(s):
 	s.found1 = LEDs.Player1 if s.ir1[0] != IrValue.Max and s.ir1[1] != IrValue.Max else 0x00
 	s.found2 = LEDs.Player2 if s.ir2[0] != IrValue.Max and s.ir2[1] != IrValue.Max else 0x00
 	s.found3 = LEDs.Player3 if s.ir3[0] != IrValue.Max and s.ir3[1] != IrValue.Max else 0x00
 	s.found4 = LEDs.Player4 if s.ir4[0] != IrValue.Max and s.ir4[1] != IrValue.Max else 0x00
+	s.found = s.found1 | s.found2 | s.found3 | s.found4
+
+def visibleIrPoints(s, minSize=0, maxSize=15, minIntensity=0):
+	# camera coordinates of all recognized IR dots; the size (extended/full IR mode) and
+	# intensity (full IR mode) limits reject e.g. sunlight and reflections
+	points = []
+	for found, ir in ((s.found1, s.ir1), (s.found2, s.ir2), (s.found3, s.ir3), (s.found4, s.ir4)):
+		if(found and minSize <= ir[2] <= maxSize and ir[3] >= minIntensity):
+			points.append((ir[0], ir[1]))
+	return points
+
+def parseIr(d, s=State(), o=6):
+	# basic format: 2x5 bytes for 4 dots
+	# values are written into the existing lists, so decoding does not allocate
+	hi = d[o+2]
+	ir = s.ir1; ir[0] = d[o]   | IR_HI[2][hi]; ir[1] = d[o+1] | IR_HI[3][hi]
+	ir = s.ir2; ir[0] = d[o+3] | IR_HI[0][hi]; ir[1] = d[o+4] | IR_HI[1][hi]
+	hi = d[o+7]
+	ir = s.ir3; ir[0] = d[o+5] | IR_HI[2][hi]; ir[1] = d[o+6] | IR_HI[3][hi]
+	ir = s.ir4; ir[0] = d[o+8] | IR_HI[0][hi]; ir[1] = d[o+9] | IR_HI[1][hi]
+	updateFound(s)
+	return s
+
+def parseIrExtended(d, s=State(), o=6):
+	# extended format: 3 bytes per dot, the low nibble of the third byte is the blob size
+	hi = d[o+2]
+	ir = s.ir1; ir[0] = d[o]    | IR_HI[2][hi]; ir[1] = d[o+1]  | IR_HI[3][hi]; ir[2] = hi & 0x0f
+	hi = d[o+5]
+	ir = s.ir2; ir[0] = d[o+3]  | IR_HI[2][hi]; ir[1] = d[o+4]  | IR_HI[3][hi]; ir[2] = hi & 0x0f
+	hi = d[o+8]
+	ir = s.ir3; ir[0] = d[o+6]  | IR_HI[2][hi]; ir[1] = d[o+7]  | IR_HI[3][hi]; ir[2] = hi & 0x0f
+	hi = d[o+11]
+	ir = s.ir4; ir[0] = d[o+9]  | IR_HI[2][hi]; ir[1] = d[o+10] | IR_HI[3][hi]; ir[2] = hi & 0x0f
+	updateFound(s)
+	return s
+
+def parseIrFull(d, ir, o):
+	# full format: 9 bytes per dot, the extended format followed by the bounding box and the intensity
+	hi = d[o+2]
+	ir[0] = d[o]   | IR_HI[2][hi]
+	ir[1] = d[o+1] | IR_HI[3][hi]
+	ir[2] = hi & 0x0f
+	ir[3] = d[o+8]
+
+def parseMotionPlus(d, s=State(), o=16):
+	s.yaw   = d[o]   | MP_HI[d[o+3]]
+	s.roll  = d[o+1] | MP_HI[d[o+4]]
+	s.pitch = d[o+2] | MP_HI[d[o+5]]
+	# slow mode bits are set while the axis turns slowly (higher resolution)
+	s.yawFast   = not d[o+3] & 0x02
+	s.rollFast  = not d[o+4] & 0x02
+	s.pitchFast = not d[o+3] & 0x01
+	# set for MotionPlus data, cleared for data of an extension in passthrough mode
+	s.motionPlusData = d[o+5] & 0x02
+	return s
+
+def parseNunchuk(d, s=State(), o=16):
+	# stick, accel (LSBs in the last byte) and the buttons (active low)
+	b = d[o+5]
+	s.motionPlusData = 0
+	s.stickX = d[o]
+	s.stickY = d[o+1]
+	s.extX   = (d[o+2] << 2) | ((b >> 2) & 0x03)
+	s.extY   = (d[o+3] << 2) | ((b >> 4) & 0x03)
+	s.extZ   = (d[o+4] << 2) | ((b >> 6) & 0x03)
+	s.extButtons = ~b & 0x03
+	return s
+
+def parseClassic(d, s=State(), o=16):
+	# left stick 6 bit, right stick and triggers 5 bit (spread over the first 4 bytes), buttons active low
+	s.motionPlusData = 0
+	s.stickX   = (d[o] & 0x3f) << 2
+	s.stickY   = (d[o+1] & 0x3f) << 2
+	s.stick2X  = (((d[o] >> 3) & 0x18) | ((d[o+1] >> 5) & 0x06) | (d[o+2] >> 7)) << 3
+	s.stick2Y  = (d[o+2] & 0x1f) << 3
+	s.triggerL = ((d[o+2] >> 2) & 0x18) | (d[o+3] >> 5)
+	s.triggerR = d[o+3] & 0x1f
+	s.extButtons = ~((d[o+4] << 8) | d[o+5]) & 0xfeff
+	return s
+
+def parseMotionPlusNunchuk(d, s=State(), o=16):
+	# passthrough mode: MotionPlus and Nunchuk data alternate, the Nunchuk data loses some LSBs
+	b = d[o+5]
+	if(b & 0x02):
+		return parseMotionPlus(d, s, o)
+	s.motionPlusData = 0
+	s.stickX = d[o]
+	s.stickY = d[o+1]
+	s.extX   = (d[o+2] << 2) | ((b >> 3) & 0x02)
+	s.extY   = (d[o+3] << 2) | ((b >> 4) & 0x02)
+	s.extZ   = ((d[o+4] & 0xfe) << 2) | ((b >> 5) & 0x06)
+	s.extButtons = ~(b >> 2) & 0x03
+	return s
+
+def parseMotionPlusClassic(d, s=State(), o=16):
+	# passthrough mode: the LSBs of the left stick carry the d-pad up/left buttons
+	if(d[o+5] & 0x02):
+		return parseMotionPlus(d, s, o)
+	parseClassic(d, s, o)
+	s.stickX = (d[o] & 0x3e) << 2
+	s.stickY = (d[o+1] & 0x3e) << 2
+	s.extButtons = ~((d[o+4] << 8) | (d[o+5] & 0xfc) | ((d[o+1] & 0x01) << 1) | (d[o] & 0x01)) & 0xfeff
+	return s
+
+# extension ID (bytes 2-5 of Register.EXTENSION_ID) -> extension name
+EXTENSION_IDS = {
+	b'\xa4\x20\x00\x00': 'nunchuk',
+	b'\xa4\x20\x01\x01': 'classic',
+	b'\xa4\x20\x04\x05': 'motionplus', # active MotionPlus
+	b'\xa4\x20\x05\x05': 'motionplus+nunchuk',
+	b'\xa4\x20\x07\x05': 'motionplus+classic',
+}
+MOTIONPLUS_INACTIVE_ID = b'\xa6\x20\x00\x05' # at Register.MOTIONPLUS_ID
+
+# decoder of the extension bytes and MotionPlus mode (None = no MotionPlus) per extension
+EXTENSIONS = {
+	'motionplus':         (parseMotionPlus,        Register.MOTIONPLUS_INIT_2_VAL),
+	'nunchuk':            (parseNunchuk,           None),
+	'classic':            (parseClassic,           None),
+	'motionplus+nunchuk': (parseMotionPlusNunchuk, Register.MOTIONPLUS_INIT_2_NUNCHUK),
+	'motionplus+classic': (parseMotionPlusClassic, Register.MOTIONPLUS_INIT_2_CLASSIC),
+}
+
+def parseButtonsState(d, s=None):
+	if(s is None): s = State()
+	parseButtons(d, s)
+	return s
+
+def parseButtonsAccelState(d, s=None):
+	if(s is None): s = State()
+	parseButtons(d, s)
+	parseAccel(d, s)
+	return s
+
+# the extension bytes of the following reports (at EXTENSION_OFFSETS) are decoded separately,
+# depending on the connected extension (see EXTENSIONS)
+
+def parseButtonsExtensionState(d, s=None):
+	# 0x32 (8 extension bytes) and 0x34 (19 extension bytes)
+	if(s is None): s = State()
+	parseButtons(d, s)
+	return s
+
+def parseButtonsAccelIrState(d, s=None):
+	if(s is None): s = State()
+	parseButtons(d, s)
+	parseAccel(d, s)
+	parseIrExtended(d, s)
+	return s
+
+def parseButtonsAccelExtensionState(d, s=None):
+	if(s is None): s = State()
+	parseButtons(d, s)
+	parseAccel(d, s)
+	return s
+
+def parseButtonsIrExtensionState(d, s=None):
+	if(s is None): s = State()
+	parseButtons(d, s)
+	parseIr(d, s, 3)
+	return s
+
+def parseButtonsAccelIrExtensionState(d, s=None):
+	if(s is None): s = State()
+	parseButtons(d, s)
+	parseAccel(d, s)
+	parseIr(d, s)
 	return s
 
-def parseButtonsAccelIrState(d):
-	s = State()
-	s = parseButtons(d, s)
-	s = parseAccel(d, s)
-	s = parseIr(d, s)
+def parseButtonsAccelIrFull1State(d, s=None):
+	# first half of the interleaved report: accel X, upper Z bits (hidden in the button bytes), dots 1+2
+	if(s is None): s = State()
+	parseButtons(d, s)
+	s.x = d[3]
+	s.z = (((d[2] >> 5) & 0x03) << 6) | (((d[1] >> 5) & 0x03) << 4) | (s.z & 0x0f)
+	s.x10 = s.x << 2
+	parseIrFull(d, s.ir1, 4)
+	parseIrFull(d, s.ir2, 13)
 	return s
 
-def parseButtonsAccelIrExtensionState(d):
-	s = State()
-	s = parseButtons(d, s)
-	s = parseAccel(d, s)
-	s = parseIr(d, s)
-	s.yaw   = d[16] | ((d[19] >> 2) & 0x3f) << 8
-	s.roll  = d[17] | ((d[20] >> 2) & 0x3f) << 8
-	s.pitch = d[18] | ((d[21] >> 2) & 0x3f) << 8
+def parseButtonsAccelIrFull2State(d, s=None):
+	# second half of the interleaved report: accel Y, lower Z bits, dots 3+4
+	if(s is None): s = State()
+	parseButtons(d, s)
+	s.y = d[3]
+	s.z = (s.z & 0xf0) | (((d[2] >> 5) & 0x03) << 2) | ((d[1] >> 5) & 0x03)
+	# the button bytes carry the z bits, so no LSBs in this mode
+	s.y10 = s.y << 2
+	s.z10 = s.z << 2
+	parseIrFull(d, s.ir3, 4)
+	parseIrFull(d, s.ir4, 13)
+	updateFound(s)
 	return s
 
+# decoder per input report type; each one fills a given (reused) State object
+DECODERS = {
+	InputReport.Buttons:                 parseButtonsState,
+	InputReport.ButtonsAccel:            parseButtonsAccelState,
+	InputReport.ButtonsExtenion:         parseButtonsExtensionState,
+	InputReport.ButtonsAccelIr:          parseButtonsAccelIrState,
+	InputReport.ButtonsExtension:        parseButtonsExtensionState,
+	InputReport.ButtonsAccelExtension:   parseButtonsAccelExtensionState,
+	InputReport.ButtonsIrExtension:      parseButtonsIrExtensionState,
+	InputReport.ButtonsAccelIrExtension: parseButtonsAccelIrExtensionState,
+	InputReport.ButtonsAccelIrFull1:     parseButtonsAccelIrFull1State,
+	InputReport.ButtonsAccelIrFull2:     parseButtonsAccelIrFull2State,
+}
+
+def hasEdges(s, p):
+	# button or IR visibility changes, i.e. everything which must not be dropped
+	return (s.buttons ^ p.buttons) or (s.found ^ p.found)
+
+# smallest input report carrying the requested data, indexed by (accel, ir, extension)
+REPORT_TYPES = {
+	(False, False, False): InputReport.Buttons,
+	(True,  False, False): InputReport.ButtonsAccel,
+	(False, False, True ): InputReport.ButtonsExtenion,
+	(False, True,  False): InputReport.ButtonsAccelIr,
+	(True,  True,  False): InputReport.ButtonsAccelIr,
+	(True,  False, True ): InputReport.ButtonsAccelExtension,
+	(False, True,  True ): InputReport.ButtonsIrExtension,
+	(True,  True,  True ): InputReport.ButtonsAccelIrExtension,
+}
+
+def selectReportType(accel=False, ir=False, extension=False, irMode=IrMode.Basic):
+	# extended and full IR data do not fit into a report together with extension data
+	if(ir and irMode == IrMode.Extended): return InputReport.ButtonsAccelIr
+	if(ir and irMode == IrMode.Full): return InputReport.ButtonsAccelIrFull1
+	return REPORT_TYPES[(bool(accel), bool(ir), bool(extension))]
+
+# IR camera mode matching the IR data format of an input report
+IR_MODES = {
+	InputReport.ButtonsAccelIr:          IrMode.Extended,
+	InputReport.ButtonsIrExtension:      IrMode.Basic,
+	InputReport.ButtonsAccelIrExtension: IrMode.Basic,
+	InputReport.ButtonsAccelIrFull1:     IrMode.Full,
+	InputReport.ButtonsAccelIrFull2:     IrMode.Full,
+}
+
+# input reports carrying accelerometer data
+ACCEL_REPORTS = {
+	InputReport.ButtonsAccel, InputReport.ButtonsAccelIr, InputReport.ButtonsAccelExtension,
+	InputReport.ButtonsAccelIrExtension, InputReport.ButtonsAccelIrFull2,
+}
+
+# input reports carrying extension (MotionPlus) data
+EXTENSION_REPORTS = {
+	InputReport.ButtonsExtenion, InputReport.ButtonsExtension, InputReport.ButtonsAccelExtension,
+	InputReport.ButtonsIrExtension, InputReport.ButtonsAccelIrExtension,
+}
+
+# position of the extension bytes per input report
+EXTENSION_OFFSETS = {
+	InputReport.ButtonsExtenion:         3,
+	InputReport.ButtonsExtension:        3,
+	InputReport.ButtonsAccelExtension:   6,
+	InputReport.ButtonsIrExtension:      13,
+	InputReport.ButtonsAccelIrExtension: 16,
+}
+
+class Signal:
+	# minimal stand-in for Qt signals when running without Qt
+	def __init__(self):
+		self.callbacks = []
+
+	def connect(self, callback):
+		self.callbacks.append(callback)
+
+	def emit(self, *args):
+		for callback in self.callbacks:
+			callback(*args)
+
 class ControllerOperationMode:
 	OFF         = 0
 	CALIBRATION = 1
@@ -181,293 +507,990 @@ class ControllerMouseState:
 	x = None
 	y = None
 	pressed = False
+	trackId = None # IR track which holds the mouse button
 
 class ControllerPointerState:
-	def __init__(self, calibX=None, calibY=None, factor=None):
+	def __init__(self, calibX=None, calibY=None, speed=None):
 		if(calibX): self.calibX = calibX
 		if(calibY): self.calibY = calibY
-		if(factor): self.factor = factor
+		if(speed): self.speed = speed
 
 	x = None
 	y = None
+	# initial gyro bias of yaw and pitch, refined automatically while the remote rests
 	calibX = 8175
 	calibY = 8140
-	factor = 0.02
+	speed = 25 # pixels per degree
+	# orientation which points to the screen center, shifted when the pointer hits an edge
+	yaw = 0.0
+	pitch = 0.0
 	visible = False
 
+def calibrationTargets(width, height, grid=2, margin=0.05):
+	# screen coordinates of the calibration points, row by row from the top left
+	points = []
+	for row in range(grid):
+		for col in range(grid):
+			points.append((
+				width  * (margin + (1.0 - 2*margin) * col / (grid - 1)),
+				height * (margin + (1.0 - 2*margin) * row / (grid - 1))
+			))
+	return points
+
 class Controller:
 	CALIBRATION_MARGIN = 0.05
+	CALIBRATION_GRIDS = [2, 3, 4] # 4, 9 or 16 calibration points
+	TILT_SCROLL_DEAD_ZONE = 8.0 # degrees of pitch around the start orientation without scrolling
+	TILT_SCROLL_SPEED = 0.25 # wheel detents per second per degree beyond the dead zone
+	STICK_DEAD_ZONE = 16 # of the Nunchuk/Classic Controller stick (8 bit)
+	STICK_SCROLL_SPEED = 15.0 # wheel detents per second at full deflection
+	STICK_ZOOM_SPEED = 4.0
 
 	evtControllerDisconnected = None
 	evtStatusReport = None
 	evtLaserPointer = None
 	evtCalibrationChanged = None
 
-	def __init__(self):
+	def __init__(self, path=None, playerIndex=0):
+		self.evtControllerDisconnected = Signal()
+		self.evtStatusReport = Signal()
+		self.evtLaserPointer = Signal()
+		self.evtCalibrationChanged = Signal()
+
 		self.configParser = None
 		self.configPath = str(Path.home())+'/.config/wiimote4linux.ini'
+		# calibrations are stored per screen (name and geometry, e.g. "HDMI-1: 0,0 1920x1080", or
+		# just the size if None) and remote
+		self.screenName = None
 
+		self.path = path
+		# Bluetooth address of the remote, used to recognize it after a reconnect
+		self.serial = None
+		self.playerIndex = playerIndex
+		# show recognized IR points via LEDs (instead of the player number)
+		self.ledFeedback = True
 		self.dev = None
+		# output reports are sent by the writer (own thread unless the owner pumps it, see reportwriter.py)
+		self.writer = None
+		self.writerThread = True
+		self.inputLoop = None
+		self.dispatchLoop = None
+		# raw reports from the reader thread to the dispatcher thread
+		self.reportQueue = queue.SimpleQueue()
+		self.queueMaxDepth = 0
+		self.queueDropped = 0
+		self.queueDispatched = 0
+		self.queueUnchanged = 0
+		self.unsupportedReports = 0
+		# previous raw report per half of interleaved reports (type & 1), to skip unchanged ones
+		self.lastReports = [None, None]
+		self.full1Unchanged = False
+		# optional hot path instrumentation (ControllerStats), enabled via config
+		self.stats = None
+		self.statsLogInterval = 0
+		# write all raw input reports to this capture file (see capture.py)
+		self.recordPath = None
 		self.mouseState = ControllerMouseState()
 		self.pointerState = ControllerPointerState()
+		# gyro calibration and orientation, kept over reconnects
+		self.motionPlus = MotionPlus(self.pointerState.calibX, None, self.pointerState.calibY)
+		# connected extension (see EXTENSIONS), identified on connect and when plugged in/out;
+		# a MotionPlus is assumed until then (or if nothing answers)
+		self.extension = 'motionplus'
+		self.extensionDecoder, self.motionPlusMode = EXTENSIONS[self.extension]
+		self.extensionConnected = None
+		self.identifying = False
+		self.motionPlusFound = False
+		self.usesMotionPlus = False
+		self.usesStick = False
+		# stick scrolling: deflected stick and time of the last update
+		self.stickActive = False
+		self.stickTime = None
+		# accelerometer calibration (read from the EEPROM on connect) and tilt
+		self.accelerometer = Accelerometer()
+		self.memory = None
+
+		self.filter = createFilter({})
+		self.filterConfig = {}
+		# persistent IDs for the IR blobs; with multiTouch, every blob is a touch contact
+		# (if the output backend supports it), otherwise the oldest blob is the pen
+		self.tracker = IrTracker()
+		self.multiTouch = False
+		self.touchFilters = {}
 
-		self.smoothingBuffer = []
-		self.maxSmoothingBufferSize = 4
+		# button/gesture bindings, configured in the [buttons] section
+		self.mapping = ButtonMapping(loadBindings({}), self.__runAction)
+		self.mappingConfig = {}
+		self.gestures = GestureDetector()
+		self.laserPointerHolds = 0
+		self.rumbleHolds = 0
+		# tilt scrolling: held bindings, speed factor, pitch at the start and time of the last update
+		self.scrollHolds = 0
+		self.scrollSpeed = 1.0
+		self.scrollPitch = 0.0
+		self.scrollTime = None
 
+		self.warpMatrix = None
+		# calibration profile (see __calibrationProfile) the warp matrix belongs to
+		self.warpProfile = None
 		self.calibrationPoints = []
+		self.calibrationGrid = 2
+		# max. residual error of a calibration in percent of the screen diagonal, None = warper default
+		self.calibrationMaxError = None
+
+		# data the remote should send; accel is fused with the MotionPlus gyro data
+		self.featureAccel = True
+		self.featureIr = True
+		self.featureExtension = True
+		# basic IR mode leaves room for MotionPlus data; extended and full IR mode report
+		# blob sizes (and intensities) for blobFilter, but without MotionPlus
+		self.irMode = IrMode.Basic
+		self.reportType = selectReportType(self.featureAccel, self.featureIr, self.featureExtension, self.irMode)
+		# (min. size, max. size, min. intensity) of accepted IR blobs
+		self.blobFilter = (0, 15, 0)
+
+		# pointer/key injection, see output.py
+		self.outputBackend = 'auto'
+		self.output = None
+		# volume changes are done in the volume controller thread, created on first use
+		self.volume = None
+
+	def start(self, screenWidth, screenHeight, dev=None):
+		# dev: use this device instead of connecting, e.g. a capture.ReplayDevice
+		self.open(screenWidth, screenHeight, dev)
 
-		pyautogui.PAUSE = 0
+		# start reading input reports
+		self.reportQueue = queue.SimpleQueue()
+		self.inputLoop = threading.Thread(target=self.__readLoop, daemon=True)
+		self.inputLoop.start()
+		self.dispatchLoop = threading.Thread(target=self.__dispatchLoop, daemon=True)
+		self.dispatchLoop.start()
 
-	def start(self, screenWidth, screenHeight):
+	def open(self, screenWidth, screenHeight, dev=None):
+		# connect and initialize the remote, without starting the threads
 		self.screenWidth = screenWidth
 		self.screenHeight = screenHeight
 
-		self.__connect()
-
-		# choose input report format
-		self.__initMotionPlus()
-		self.__initIr()
-		self.__sendOutputReport(OutputReport.Type,
-			struct.pack('B', InputReport.FLAG_CONTINUOUS) + struct.pack('B', InputReport.ButtonsAccelIrExtension)
-		)
+		if(dev):
+			self.dev = dev
+			# e.g. hidraw.HidrawDevice or a capture.ReplayDevice
+			self.serial = getattr(dev, 'serial', None) or None
+		else:
+			self.__connect()
+		if(self.writer):
+			self.writer.close()
+		self.writer = OutputReportWriter(self.dev, self.writerThread)
+		self.memory = MemoryReader(self.writer)
+		self.memory.read(Accelerometer.CALIBRATION_ADDRESS, Accelerometer.CALIBRATION_SIZE, self.__onAccelCalibration, time.monotonic())
 
-		# software setup
-		self.__initWarpMatrix()
+		# software setup, before the remote, because the config selects the IR mode
+		# on a reconnect, the calibration of this session is kept if the config file has none,
+		# but only for the same remote and screen
+		previousWarp = self.warpMatrix if self.warpMatrix and self.warpMatrix.computed else None
+		previousProfile = self.warpProfile
+		self.warpProfile = self.__calibrationProfile()
 		self.operationMode = ControllerOperationMode.OFF
 		self.__readConfig()
+		if(previousWarp and not self.warpMatrix.computed and previousProfile == self.warpProfile):
+			self.warpMatrix = previousWarp
+			self.operationMode = ControllerOperationMode.DRAWING
 
-		# start reading input reports
-		self.inputLoop = threading.Thread(target=self.__inputLoop, daemon=True)
-		self.inputLoop.start()
+		if(not self.ledFeedback):
+			self.setPlayerLeds()
+		# choose input report format
+		self.reportType = selectReportType(self.featureAccel, self.featureIr, self.featureExtension, self.irMode)
+		self.__setExtension(self.extension)
+		if(self.reportType in EXTENSION_REPORTS):
+			self.__initExtension()
+		if(self.featureIr):
+			self.__initIr()
+		self.__sendReportType()
+		self.__initOutput()
+
+		# two state objects are swapped on every report instead of allocating new ones
+		self.previousState = State()
+		self.currentState = State()
+		self.lastReports = [None, None]
+		self.previousState.player = self.currentState.player = self.playerIndex
+		self.nextStatsLog = time.monotonic() + self.statsLogInterval
 
 	def __connect(self):
+		# imported here, so that replaying captures works without hidapi
+		import hid
 		#for d in hid.enumerate(): print(d)
 		# connect to HID device
+		self.dev = None
+		if(self.path):
+			self.dev = hid.Device(path=self.path)
+			self.serial = self.dev.serial
+			print(f'Connected to: {self.dev.product}, Serial: {self.dev.serial}, Player: {self.playerIndex+1}')
+			return
 		for id in IDs:
 			try:
 				self.dev = hid.Device(id['vid'], id['pid'])
+				self.serial = self.dev.serial
 				print(f'Connected to: {self.dev.product}, Serial: {self.dev.serial}')
 				break
 			except Exception as e: pass
 		if(not self.dev):
 			raise Exception('Unable to find a Wiimote HID device')
 
+	def isRunning(self):
+		return self.dispatchLoop is not None and self.dispatchLoop.is_alive()
+
+	def enableStats(self, logInterval=0):
+		# logInterval: print a stats line every n seconds (0 = never)
+		self.statsLogInterval = logInterval
+		self.stats = ControllerStats()
+
+	def getStats(self):
+		if(not self.stats): return None
+		return self.stats.snapshot(self)
+
+	def queueMetrics(self):
+		return {
+			'depth': self.reportQueue.qsize(),
+			'maxDepth': self.queueMaxDepth,
+			'dropped': self.queueDropped,
+			'unchanged': self.queueUnchanged,
+			'dispatched': self.queueDispatched,
+			'written': self.writer.written if self.writer else 0,
+			'coalesced': self.writer.coalesced if self.writer else 0,
+		}
+
+	def setPlayerLeds(self):
+		self.writer.setLeds(PLAYER_LEDS[self.playerIndex])
+
+	def startCalibration(self):
+		self.operationMode = ControllerOperationMode.CALIBRATION
+		self.calibrationPoints.clear()
+
+	def __sendReportType(self):
+		self.writer.send(self.__outputReport(OutputReport.Type,
+			struct.pack('B', InputReport.FLAG_CONTINUOUS) + struct.pack('B', self.reportType)
+		))
+
 	def __writeRegister(self, register, payload):
-		self.__sendOutputReport(OutputReport.WriteMemory,
+		return self.__outputReport(OutputReport.WriteMemory,
 			struct.pack('>I', register) + struct.pack('B', len(payload)) + payload.ljust(16, b'\x00')
 		)
 
-	def __sendOutputReport(self, report, payload):
-		packet = struct.pack('B', report) + payload
-		#print('<==', packet.hex())
-		self.dev.write(packet)
+	def __outputReport(self, report, payload):
+		return struct.pack('B', report) + payload
+
+	def __onAccelCalibration(self, data):
+		if(self.accelerometer.setCalibration(data)):
+			print('Accelerometer calibration: zero {}, scale {}'.format(
+				self.accelerometer.zero, ['{:.4f}'.format(v) for v in self.accelerometer.scale]
+			))
+
+	def __initExtension(self):
+		# an inactive MotionPlus answers at its own ID register, the extension (also one plugged into
+		# the MotionPlus) at the normal one after an unencrypted init; this deactivates the MotionPlus
+		# until the extension is known, so status reports are ignored meanwhile
+		self.identifying = True
+		self.motionPlusFound = False
+		self.writer.sendBatch([
+			self.__writeRegister(Register.EXTENSION_INIT_1, bytes([Register.EXTENSION_INIT_1_VAL])),
+			self.__writeRegister(Register.EXTENSION_INIT_2, bytes([Register.EXTENSION_INIT_2_VAL])),
+		])
+		t = time.monotonic()
+		self.memory.read(Register.MOTIONPLUS_ID, 6, self.__onMotionPlusId, t)
+		self.memory.read(Register.EXTENSION_ID, 6, self.__onExtensionId, t)
+
+	def __onMotionPlusId(self, data):
+		self.motionPlusFound = data is not None and data[2:6] == MOTIONPLUS_INACTIVE_ID
+
+	def __onExtensionId(self, data):
+		extension = EXTENSION_IDS.get(data[2:6]) if data is not None else None
+		if(self.motionPlusFound):
+			extension = 'motionplus+'+extension if extension in ('nunchuk', 'classic') else 'motionplus'
+		elif(data is None):
+			# no extension or no answer (e.g. a replayed capture): keep trying to activate a MotionPlus
+			extension = 'motionplus'
+		if(extension is None):
+			print('Unsupported extension, ID', data.hex())
+		elif(extension != self.extension):
+			print('Extension:', extension)
+		self.__setExtension(extension)
+		self.identifying = False
+		self.extensionConnected = data is not None or self.motionPlusFound
+		if(self.motionPlusMode is not None):
+			self.__initMotionPlus()
+
+	def __setExtension(self, extension):
+		self.extension = extension
+		self.extensionDecoder, self.motionPlusMode = EXTENSIONS.get(extension, (None, None))
+		reportsExtension = self.reportType in EXTENSION_REPORTS
+		self.usesMotionPlus = reportsExtension and self.motionPlusMode is not None
+		self.usesStick = reportsExtension and extension is not None and extension.endswith(('nunchuk', 'classic'))
+		self.stickActive = False
+		self.stickTime = None
 
 	def __initMotionPlus(self):
-		self.__writeRegister(Register.MOTIONPLUS_INIT_1, bytes([Register.MOTIONPLUS_INIT_1_VAL]))
-		self.__writeRegister(Register.MOTIONPLUS_INIT_2, bytes([Register.MOTIONPLUS_INIT_2_VAL]))
+		self.writer.sendBatch([
+			self.__writeRegister(Register.MOTIONPLUS_INIT_1, bytes([Register.MOTIONPLUS_INIT_1_VAL])),
+			self.__writeRegister(Register.MOTIONPLUS_INIT_2, bytes([self.motionPlusMode])),
+		])
+		self.motionPlus.activated(time.monotonic())
+
+	def __activateMotionPlus(self):
+		self.writer.send(self.__writeRegister(Register.MOTIONPLUS_INIT_2, bytes([self.motionPlusMode])))
+		self.motionPlus.activated(time.monotonic())
 
 	def __initIr(self):
-		# IR init procedure
-		self.__sendOutputReport(OutputReport.IR, bytes([IrState.On]))
-		self.__sendOutputReport(OutputReport.IR2, bytes([IrState.On]))
-		self.__writeRegister(Register.IR, bytes([0x08]))
-		self.__writeRegister(Register.IR_SENSITIVITY_1, IrSensitivity.Max[0])
-		self.__writeRegister(Register.IR_SENSITIVITY_2, IrSensitivity.Max[1])
-		self.__writeRegister(Register.IR_MODE, bytes([IrMode.Basic]))
-		self.__writeRegister(Register.IR, bytes([0x08]))
+		# IR init procedure, queued as one batch; each register write waits for its acknowledgement
+		self.writer.sendBatch([
+			self.__outputReport(OutputReport.IR, bytes([IrState.On])),
+			self.__outputReport(OutputReport.IR2, bytes([IrState.On])),
+			self.__writeRegister(Register.IR, bytes([0x08])),
+			self.__writeRegister(Register.IR_SENSITIVITY_1, IrSensitivity.Max[0]),
+			self.__writeRegister(Register.IR_SENSITIVITY_2, IrSensitivity.Max[1]),
+			self.__writeRegister(Register.IR_MODE, bytes([IR_MODES.get(self.reportType, IrMode.Basic)])),
+			self.__writeRegister(Register.IR, bytes([0x08])),
+		])
+
+	def __runAction(self, binding, active):
+		# called by the button mapping when a binding starts (active) or ends
+		action = binding.action
+		if(action == 'key'):
+			try:
+				if(active): self.output.pressKey(binding.argument)
+			except KeyError:
+				print(f'Key "{binding.argument}" is not supported by the {self.output.name} output')
+		elif(action == 'volume'):
+			#pyautogui.press('volumeup') # does not work under Linux
+			if(active):
+				try: self.__volumeController().press(int(binding.argument or 1))
+				except ValueError: print(f'Invalid volume step "{binding.argument}"')
+			elif(self.volume): self.volume.release()
+		elif(action == 'laserpointer'):
+			# several bindings (e.g. A and B) may hold the pointer at the same time
+			self.laserPointerHolds += 1 if active else -1
+			if(not self.laserPointerHolds):
+				self.pointerState.x = None
+				self.pointerState.y = None
+				self.pointerState.visible = False
+				self.evtLaserPointer.emit(False, 0, 0)
+		elif(action == 'scroll'):
+			# scrolls while held, by tilting the nose up/down relative to the orientation at the press
+			self.scrollHolds += 1 if active else -1
+			if(active and self.scrollHolds == 1):
+				try: self.scrollSpeed = float(binding.argument or 1)
+				except ValueError: self.scrollSpeed = 1.0
+				self.scrollPitch = self.accelerometer.tilt()[0]
+				self.scrollTime = None
+		elif(action == 'rumble'):
+			# e.g. to find out which remote is which
+			self.rumbleHolds += 1 if active else -1
+			if(self.writer):
+				# the rumble bit is sent with the LED state, which is unknown until the IR dots changed
+				if(self.ledFeedback and self.writer.leds is None):
+					self.writer.setLeds(0xf0 - self.currentState.found)
+				self.writer.setRumble(self.rumbleHolds > 0)
+		elif(action == 'calibrate'):
+			if(active):
+				self.startCalibration()
+				self.evtCalibrationChanged.emit(len(self.calibrationPoints))
+				print('Calibration initiated via button')
+
+	def __updateLaserPointer(self):
+		# maps the orientation to the screen: the pointer starts in the center and is clamped to the
+		# screen; at an edge the reference orientation moves along, so turning back moves the pointer at once
+		# without MotionPlus, the accelerometer tilt is used: rolling the remote moves the pointer sideways
+		pointerState = self.pointerState
+		if(self.usesMotionPlus):
+			yaw = self.motionPlus.yaw
+			pitch = self.motionPlus.pitch
+		else:
+			pitch, roll = self.accelerometer.tilt()
+			yaw = -roll
+		if(not pointerState.visible):
+			pointerState.visible = True
+			pointerState.yaw = yaw
+			pointerState.pitch = pitch
+		maxX = (self.screenWidth - 1) / 2 / pointerState.speed
+		maxY = (self.screenHeight - 1) / 2 / pointerState.speed
+		dx = yaw - pointerState.yaw
+		dy = pointerState.pitch - pitch
+		if(dx > maxX): pointerState.yaw += dx - maxX; dx = maxX
+		elif(dx < -maxX): pointerState.yaw += dx + maxX; dx = -maxX
+		if(dy > maxY): pointerState.pitch -= dy - maxY; dy = maxY
+		elif(dy < -maxY): pointerState.pitch -= dy + maxY; dy = -maxY
+		x = int(self.screenWidth / 2 + dx * pointerState.speed)
+		y = int(self.screenHeight / 2 + dy * pointerState.speed)
+		# only changed positions are emitted
+		if(x != pointerState.x or y != pointerState.y):
+			pointerState.x = x
+			pointerState.y = y
+			self.evtLaserPointer.emit(True, x, y)
+
+	def __updateTiltScroll(self, t):
+		pitch = self.accelerometer.tilt()[0] - self.scrollPitch
+		dt = t - self.scrollTime if self.scrollTime is not None else 0.0
+		self.scrollTime = t
+		if(abs(pitch) <= self.TILT_SCROLL_DEAD_ZONE or dt <= 0.0): return
+		# nose up scrolls up (positive wheel direction)
+		pitch -= self.TILT_SCROLL_DEAD_ZONE if pitch > 0 else -self.TILT_SCROLL_DEAD_ZONE
+		self.output.scroll(pitch * self.TILT_SCROLL_SPEED * self.scrollSpeed * dt)
+
+	def __updateStick(self, s, t):
+		# up/down scrolls (zooms while Nunchuk Z is held), left/right scrolls sideways;
+		# high resolution wheel events, so the speed can follow the deflection smoothly
+		dx = self.__stickDeflection(s.stickX)
+		dy = self.__stickDeflection(s.stickY)
+		if(not dx and not dy):
+			self.stickActive = False
+			self.stickTime = None
+			return
+		dt = min(t - self.stickTime, 0.1) if self.stickTime is not None else 0.0
+		self.stickTime = t
+		self.stickActive = True
+		if(dt <= 0.0): return
+		if(dy):
+			if(self.extension.endswith('nunchuk') and s.extButtons & NunchukButtons.Z):
+				self.output.zoom(dy * self.STICK_ZOOM_SPEED * dt)
+			else:
+				self.output.scroll(dy * self.STICK_SCROLL_SPEED * dt)
+		if(dx):
+			self.output.scroll(dx * self.STICK_SCROLL_SPEED * dt, horizontal=True)
+
+	def __stickDeflection(self, value):
+		# -1..1 beyond the dead zone, quadratic for fine control of slow speeds
+		value -= 0x80
+		deadZone = self.STICK_DEAD_ZONE
+		if(-deadZone <= value <= deadZone): return 0.0
+		deflection = min(1.0, (abs(value) - deadZone) / (0x7f - deadZone))
+		return deflection * deflection if value > 0 else -deflection * deflection
 
 	def __initWarpMatrix(self):
 		self.warpMatrix = warper()
-		self.warpMatrix.setDestination(
-			self.screenWidth  * self.CALIBRATION_MARGIN,
-			self.screenHeight * self.CALIBRATION_MARGIN,
-			self.screenWidth  * (1.0 - self.CALIBRATION_MARGIN),
-			self.screenHeight * self.CALIBRATION_MARGIN,
-			self.screenWidth  * self.CALIBRATION_MARGIN,
-			self.screenHeight * (1.0 - self.CALIBRATION_MARGIN),
-			self.screenWidth  * (1.0 - self.CALIBRATION_MARGIN),
-			self.screenHeight * (1.0 - self.CALIBRATION_MARGIN)
-		)
+		self.warpMatrix.setDestinationPoints(calibrationTargets(
+			self.screenWidth, self.screenHeight, self.calibrationGrid, self.CALIBRATION_MARGIN
+		))
+		if(self.calibrationMaxError is not None):
+			self.warpMatrix.maxResidualRatio = self.calibrationMaxError / 100
+
+	def calibrationPointCount(self):
+		return self.calibrationGrid * self.calibrationGrid
+
+	def __initOutput(self):
+		if(self.output):
+			if(self.outputBackend in ('auto', self.output.name) and self.outputSize == (self.screenWidth, self.screenHeight)):
+				return
+			self.output.close()
+		self.output = createBackend(self.outputBackend, self.screenWidth, self.screenHeight)
+		self.outputSize = (self.screenWidth, self.screenHeight)
+
+	def __volumeController(self):
+		if(self.volume is None):
+			self.volume = VolumeController()
+		return self.volume
 
 	def __readConfig(self):
-		self.configParser = configparser.ConfigParser()
-		self.configParser.read(self.configPath)
+		# shared with the other controllers, parsed again only if the file changed
+		self.configParser = configStore(self.configPath).load()
 
+		if(self.configParser.has_section('general')):
+			config = dict(self.configParser.items('general'))
+			self.outputBackend = config.get('output', self.outputBackend)
+			self.recordPath = config.get('record', self.recordPath)
+			if(self.configParser.getboolean('general', 'stats', fallback=False) and not self.stats):
+				self.enableStats(int(config.get('stats-log-interval', 0)))
+
+		config = {}
 		if(self.configParser.has_section('activeboard')):
 			config = dict(self.configParser.items('activeboard'))
-			self.maxSmoothingBufferSize = int(config.get('smoothing', self.maxSmoothingBufferSize))
-			topleft = config.get('calibration-topleft', '0,0').split(',')
-			topright = config.get('calibration-topright', '0,0').split(',')
-			bottomleft = config.get('calibration-bottomleft', '0,0').split(',')
-			bottomright = config.get('calibration-bottomright', '0,0').split(',')
-			self.warpMatrix.setSource(
-				int(topleft[0]), int(topleft[1]),
-				int(topright[0]), int(topright[1]),
-				int(bottomleft[0]), int(bottomleft[1]),
-				int(bottomright[0]), int(bottomright[1])
+			try:
+				self.filter = createFilter(config)
+				self.filterConfig = config
+			except ValueError as e:
+				print('Invalid filter in config file:', e)
+			self.multiTouch = self.configParser.getboolean('activeboard', 'multitouch', fallback=False)
+			irMode = config.get('ir-mode', 'basic')
+			if(irMode not in IR_MODE_NAMES):
+				print(f'Invalid ir-mode "{irMode}" in config file, use one of: '+', '.join(IR_MODE_NAMES))
+				irMode = 'basic'
+			self.irMode = IR_MODE_NAMES[irMode]
+			# sizes are only reported in extended and full mode, intensities only in full mode
+			self.blobFilter = (
+				int(config.get('ir-min-size', 0)) if self.irMode != IrMode.Basic else 0,
+				int(config.get('ir-max-size', 15)) if self.irMode != IrMode.Basic else 15,
+				int(config.get('ir-min-intensity', 0)) if self.irMode == IrMode.Full else 0,
 			)
-			self.warpMatrix.computeWarp()
-			self.operationMode = ControllerOperationMode.DRAWING
+			grid = int(config.get('calibration-grid', self.calibrationGrid))
+			if(grid in self.CALIBRATION_GRIDS): self.calibrationGrid = grid
+			if('calibration-max-error' in config):
+				try:
+					self.calibrationMaxError = float(config['calibration-max-error'])
+				except ValueError:
+					print('Invalid calibration-max-error in config file:', config['calibration-max-error'])
+
+		# the calibration profile of this screen and remote, otherwise a calibration in [activeboard]
+		# (written by older versions)
+		profile = self.__calibrationProfile()
+		if(self.configParser.has_section(profile)):
+			config = dict(self.configParser.items(profile))
+			grid = int(config.get('calibration-grid', self.calibrationGrid))
+			if(grid in self.CALIBRATION_GRIDS): self.calibrationGrid = grid
+		self.__initWarpMatrix()
+
+		if('calibration-points' in config):
+			points = [p.split(',') for p in config['calibration-points'].split(';')]
+		elif('calibration-topleft' in config):
+			# legacy format with the 4 corners in separate keys
+			points = [config.get(key, '0,0').split(',') for key in
+				['calibration-topleft', 'calibration-topright', 'calibration-bottomleft', 'calibration-bottomright']]
+		else:
+			points = []
+		if(len(points) == self.calibrationPointCount()):
+			self.warpMatrix.setSourcePoints([(int(p[0]), int(p[1])) for p in points])
+			try:
+				# the warp matrix cached in the profile saves the computation
+				if('warp' in config):
+					try:
+						self.warpMatrix.setWarp([float(v) for v in config['warp'].split(',')], float(config.get('residual', 0)))
+					except ValueError:
+						self.warpMatrix.computeWarp()
+				else:
+					self.warpMatrix.computeWarp()
+				self.operationMode = ControllerOperationMode.DRAWING
+			except ValueError as e:
+				print('Invalid calibration in config file:', e)
+
+		# the mapping table is only compiled again if the bindings changed
+		config = dict(self.configParser.items('buttons')) if self.configParser.has_section('buttons') else {}
+		if(config != self.mappingConfig):
+			try:
+				self.mapping.reset()
+				self.mapping = ButtonMapping(loadBindings(config), self.__runAction)
+				self.mappingConfig = config
+			except ValueError as e:
+				print('Invalid button mapping in config file:', e)
 
 		if(self.configParser.has_section('laserpointer')):
 			config = dict(self.configParser.items('laserpointer'))
+			speed = self.pointerState.speed
+			if('speed' in config):
+				speed = float(config['speed'])
+			elif('factor' in config):
+				# legacy: pixels per raw gyro unit and report (at ~100 reports/s)
+				speed = float(config['factor']) * MotionPlus.SLOW_SCALE * 100
 			self.pointerState = ControllerPointerState(
 				int(config.get('yaw', self.pointerState.calibX)),
 				int(config.get('pitch', self.pointerState.calibY)),
-				float(config.get('factor', self.pointerState.factor)),
+				speed,
 			)
+			if(not self.motionPlus.calibrated):
+				self.motionPlus.bias[0] = self.pointerState.calibX
+				self.motionPlus.bias[2] = self.pointerState.calibY
+
+	def __calibrationProfile(self):
+		# config section of the calibration for the current screen and remote
+		screen = self.screenName or '{}x{}'.format(self.screenWidth, self.screenHeight)
+		return 'calibration {} {}'.format(self.serial or '-', screen)
 
-	def __saveConfig(self, topleftx, toplefty, toprightx, toprighty, bottomleftx, bottomlefty, bottomrightx, bottomrighty):
-		if(not self.configParser.has_section('activeboard')):
-			self.configParser.add_section('activeboard')
-		self.configParser['activeboard']['calibration-topleft'] = str(topleftx)+','+str(toplefty)
-		self.configParser['activeboard']['calibration-topright'] = str(toprightx)+','+str(toprighty)
-		self.configParser['activeboard']['calibration-bottomleft'] = str(bottomleftx)+','+str(bottomlefty)
-		self.configParser['activeboard']['calibration-bottomright'] = str(bottomrightx)+','+str(bottomrighty)
-
-		with open(self.configPath, 'w') as f:
-			self.configParser.write(f)
-
-	def __smooth(self, x, y):
-		smoothingBufferSize = 1
-		for sb in self.smoothingBuffer:
-			x += sb[0]; y += sb[1]
-			smoothingBufferSize += 1
-		x = x / smoothingBufferSize
-		y = y / smoothingBufferSize
-		self.smoothingBuffer.insert(0, [x, y])
-		self.smoothingBuffer = self.smoothingBuffer[:self.maxSmoothingBufferSize]
-		return x, y
-
-	def __inputLoop(self):
-		previousState = State()
+	def __saveConfig(self, points):
+		# written in the background, the input thread does not wait for the disk
+		store = configStore(self.configPath)
+		store.update(self.__calibrationProfile(), {
+			'calibration-grid': self.calibrationGrid,
+			'calibration-points': ';'.join([str(p[0])+','+str(p[1]) for p in points]),
+			'warp': ','.join(repr(v) for v in self.warpMatrix.warpMat),
+			'residual': '{:.3f}'.format(self.warpMatrix.residual),
+		})
+		self.configParser = store.load()
 
+	def __readLoop(self):
+		# only read and timestamp, everything else is done by the dispatcher
+		# so that slow consumers never delay the next read
+		reportQueue = self.reportQueue
+		recorder = CaptureWriter(self.recordPath) if self.recordPath else None
 		while True:
 			try:
 				d = self.dev.read(64)
 			except Exception as e:
-				self.evtControllerDisconnected.emit()
+				# release the stale device node, the remote gets a new one when it reconnects
+				self.writer.close()
+				try: self.dev.close()
+				except Exception: pass
+				reportQueue.put(None)
 				break
-			currentState = State()
-
-			if(d[0] == InputReport.Status):
-				# parse status report
-				batteryCritical = d[3] & 0b00000001
-				batteryLevelPercent = int(d[6] * 100 / 255)
-				self.evtStatusReport.emit(batteryLevelPercent)
-				if(batteryCritical):
-					print('!!! BATTERY CRITICAL', str(batteryLevelPercent)+'%')
-				# re-enable to desired input report
-				self.__sendOutputReport(OutputReport.Type,
-					struct.pack('B', InputReport.FLAG_CONTINUOUS) + struct.pack('B', InputReport.ButtonsAccelIrExtension)
-				)
+			t = time.monotonic()
+			if(recorder): recorder.write(t, d)
+			reportQueue.put((t, d))
+		if(recorder): recorder.close()
 
-			elif(d[0] == InputReport.ReadData):
-				# todo: reactive MotionPlus (only when inactive; gets inactive sometimes)
-				self.__writeRegister(Register.MOTIONPLUS_INIT_2, bytes([Register.MOTIONPLUS_INIT_2_VAL]))
-				continue
+	def __dispatchLoop(self):
+		reportQueue = self.reportQueue
+		while True:
+			item = reportQueue.get()
+			if(item is None):
+				# e.g. stop volume auto-repeat of a held button
+				self.mapping.reset()
+				self.evtControllerDisconnected.emit(self.playerIndex)
+				break
+			backlog = reportQueue.qsize()
+			if(backlog > self.queueMaxDepth): self.queueMaxDepth = backlog
+			self.processReport(item[0], item[1], backlog)
 
-			# parse data from supported reports
-			elif(d[0] == InputReport.ButtonsAccelIr):
-				currentState = parseButtonsAccelIrState(d)
-			elif(d[0] == InputReport.ButtonsAccelIrExtension):
-				currentState = parseButtonsAccelIrExtensionState(d)
-			else:
-				#print('Unsupported report:', d.hex())
-				continue
-
-
-			# set LEDs corresponding to recognized IR points
-			if(currentState.found1 != previousState.found1 or currentState.found2 != previousState.found2
-			or currentState.found3 != previousState.found3 or currentState.found4 != previousState.found4):
-				self.__sendOutputReport(OutputReport.LEDs, bytes([
-					0xff-(currentState.found1 + currentState.found2 + currentState.found3 + currentState.found4 + LEDs.Rumble)
-				]))
-
-			# presenter mode - press keys
-			if(currentState.btnUp and not previousState.btnUp):
-				pyautogui.press('up')
-			elif(currentState.btnDown and not previousState.btnDown):
-				pyautogui.press('down')
-			elif(currentState.btnLeft and not previousState.btnLeft):
-				pyautogui.press('left')
-			elif(currentState.btnRight and not previousState.btnRight):
-				pyautogui.press('right')
-			elif(currentState.btnPlus and not previousState.btnPlus):
-				#pyautogui.press('volumeup') # does not work under Linux
-				m = alsaaudio.Mixer()
-				m.setvolume(m.getvolume()[0] + 2)
-			elif(currentState.btnMinus and not previousState.btnMinus):
-				#pyautogui.press('volumedown') # does not work under Linux
-				m = alsaaudio.Mixer()
-				m.setvolume(m.getvolume()[0] - 2)
-
-			# laserpointer mode - show dot on screen
-			elif(currentState.btnA or currentState.btnB):
-				self.pointerState.x = int( (currentState.yaw - self.pointerState.calibX) * self.pointerState.factor )
-				self.pointerState.y = int( (currentState.pitch - self.pointerState.calibY) * -self.pointerState.factor )
-				self.evtLaserPointer.emit(True, self.pointerState.x, self.pointerState.y)
-			elif((not currentState.btnA and not currentState.btnB)
-			and (previousState.btnA or previousState.btnB)):
-				self.pointerState.x = None
-				self.pointerState.y = None
-				self.evtLaserPointer.emit(False, 0, 0)
+	def processReport(self, t, d, backlog=0):
+		# handles one raw input report (t = read timestamp), called by the dispatcher thread or the asyncio reader
+		# returns the decoded state if the report was dispatched, None otherwise
+		# (the state object is reused for later reports)
+		clock = time.perf_counter_ns
+		stats = self.stats
+		if(stats):
+			dispatchStart = clock()
+			now = time.monotonic()
+			stats.add('read', int((now - t) * 1e9))
+			stats.countReport(now)
+			if(self.statsLogInterval and now >= self.nextStatsLog):
+				self.nextStatsLog = now + self.statsLogInterval
+				print(f'Player {self.playerIndex+1}:', formatStats(stats.snapshot(self)))
 
-			# whiteboard mode - calibration
-			elif(currentState.btnHome and not previousState.btnHome):
-				self.operationMode = ControllerOperationMode.CALIBRATION
-				self.calibrationPoints.clear()
-				self.evtCalibrationChanged.emit(len(self.calibrationPoints))
-				print('Calibration initiated via home button')
-
-			# whiteboard mode - move mouse
-			elif(currentState.found1):
-				if(self.operationMode == ControllerOperationMode.DRAWING):
-					# translate coordinates
-					x, y = self.warpMatrix.warp(currentState.ir1[0], currentState.ir1[1])
-					# apply smoothing and move mouse
-					self.mouseState.x, self.mouseState.y = self.__smooth(x, y)
-					pyautogui.moveTo(
-						min(self.screenWidth-2, max(0, self.mouseState.x)),
-						min(self.screenHeight-2, max(0, self.mouseState.y))
-					)
-					if(not self.mouseState.pressed):
-						pyautogui.mouseDown()
-						self.mouseState.pressed = True
-
-				elif(self.operationMode == ControllerOperationMode.CALIBRATION
-				and not previousState.found1):
-					if(len(self.calibrationPoints) < 4):
-						self.calibrationPoints.append([currentState.ir1[0], currentState.ir1[1]])
-						print('Calibration point {}: {},{}'.format(len(self.calibrationPoints), currentState.ir1[0], currentState.ir1[1]))
-						self.evtCalibrationChanged.emit(len(self.calibrationPoints))
-					if(len(self.calibrationPoints) == 4):
-						self.warpMatrix.setSource(
-							int(self.calibrationPoints[0][0]), int(self.calibrationPoints[0][1]),
-							int(self.calibrationPoints[1][0]), int(self.calibrationPoints[1][1]),
-							int(self.calibrationPoints[2][0]), int(self.calibrationPoints[2][1]),
-							int(self.calibrationPoints[3][0]), int(self.calibrationPoints[3][1])
-						)
-						try:
-							self.warpMatrix.computeWarp()
-							self.__saveConfig(
-								self.calibrationPoints[0][0], self.calibrationPoints[0][1],
-								self.calibrationPoints[1][0], self.calibrationPoints[1][1],
-								self.calibrationPoints[2][0], self.calibrationPoints[2][1],
-								self.calibrationPoints[3][0], self.calibrationPoints[3][1]
-							)
-							self.operationMode = ControllerOperationMode.DRAWING
-							print('Calibration done, switch to operation mode')
-						except ZeroDivisionError:
-							# invalid calibration data (e.g. points too close)
-							print(traceback.format_exc())
-
-			else: # mouse up
-				self.smoothingBuffer.clear()
-				self.mouseState.x = None
-				self.mouseState.y = None
-				if(self.mouseState.pressed):
-					pyautogui.mouseUp()
+		if(d[0] == InputReport.Status):
+			# parse status report
+			batteryCritical = d[3] & 0b00000001
+			batteryLevelPercent = int(d[6] * 100 / 255)
+			self.evtStatusReport.emit(batteryLevelPercent)
+			if(batteryCritical):
+				print('!!! BATTERY CRITICAL', str(batteryLevelPercent)+'%')
+			# an extension was plugged in or out, or the MotionPlus deactivated itself (extension flag cleared)
+			connected = bool(d[3] & 0x02)
+			if(self.reportType in EXTENSION_REPORTS and not self.identifying and connected != self.extensionConnected):
+				self.extensionConnected = connected
+				self.__initExtension()
+			# re-enable to desired input report
+			self.__sendReportType()
+			return None
+
+		elif(d[0] == InputReport.ReadData):
+			self.memory.handleReport(d, t)
+			return None
+
+		elif(d[0] == InputReport.AcknowledgeResult):
+			# report number and error code of an acknowledged output report
+			self.writer.acknowledge(d[3], d[4])
+			return None
+
+		# parse data from supported reports
+		decoder = DECODERS.get(d[0])
+		if(decoder is None):
+			#print('Unsupported report:', d.hex())
+			self.unsupportedReports += 1
+			return None
+		# the remote reports continuously, also while nothing moves, so a report with the same bytes
+		# as the previous one of its type is skipped; it is decoded anyway while something depends
+		# on time or on every report: a pending long press, a visible pen (its filters settle), a
+		# shake, tilt scrolling, the laser pointer, stick scrolling, the MotionPlus data timeout and
+		# a pending memory read (its reply timeout is only checked while decoding)
+		# interleaved full reports are skipped only if both halves are unchanged, the first half is
+		# always decoded
+		slot = d[0] & 0x01
+		unchanged = d == self.lastReports[slot]
+		self.lastReports[slot] = d
+		if(d[0] == InputReport.ButtonsAccelIrFull1):
+			self.full1Unchanged = unchanged
+		elif(unchanged and not self.mapping.waiting and not self.tracker.tracks
+		and t >= self.gestures.shakeUntil and not self.scrollHolds and not self.laserPointerHolds
+		and not self.stickActive and not (self.usesMotionPlus and self.motionPlus.needsActivation(t))
+		and self.memory.pending is None
+		and (d[0] != InputReport.ButtonsAccelIrFull2 or self.full1Unchanged)):
+			if(d[0] == InputReport.ButtonsAccelIrFull2):
+				# restore the complete state, the first half decoded the same values again
+				self.previousState, self.currentState = self.currentState, self.previousState
+			self.queueUnchanged += 1
+			return None
+		# the second half of an interleaved report completes the state of the first half
+		if(d[0] != InputReport.ButtonsAccelIrFull2):
+			self.previousState, self.currentState = self.currentState, self.previousState
+		currentState = self.currentState
+		previousState = self.previousState
+		extensionDecoder = self.extensionDecoder if d[0] in EXTENSION_OFFSETS else None
+		if(stats):
+			t0 = clock()
+			decoder(d, currentState)
+			if(extensionDecoder): extensionDecoder(d, currentState, EXTENSION_OFFSETS[d[0]])
+			stats.add('parse', clock() - t0)
+		else:
+			decoder(d, currentState)
+			if(extensionDecoder): extensionDecoder(d, currentState, EXTENSION_OFFSETS[d[0]])
+		if(d[0] == InputReport.ButtonsAccelIrFull1):
+			return None
+		if(d[0] in ACCEL_REPORTS):
+			self.accelerometer.update(currentState)
+		if(self.memory.pending is not None and t >= self.memory.deadline):
+			self.memory.checkTimeout(t)
+
+		# orientation is integrated over all reports, including those dropped below
+		if(self.usesMotionPlus and not self.motionPlus.update(currentState, t)
+		and self.motionPlus.needsActivation(t)):
+			self.__activateMotionPlus()
+
+		# under backpressure, skip reports which only carry pointer motion (never button edges),
+		# newer positions are already waiting in the queue
+		if(backlog and not hasEdges(currentState, previousState)):
+			self.previousState, self.currentState = currentState, previousState
+			self.queueDropped += 1
+			return None
+		self.queueDispatched += 1
+
+
+		# set LEDs corresponding to recognized IR points (coalesced and rate limited by the writer)
+		if(self.ledFeedback and currentState.found != previousState.found):
+			self.writer.setLeds(0xf0 - currentState.found)
+
+		# persistent identities of the visible IR blobs
+		tracks = self.tracker.update(visibleIrPoints(currentState, *self.blobFilter), t)
+
+		# presenter keys, volume, laser pointer, calibration etc. via the button mapping;
+		# these actions and the whiteboard below do not block each other
+		mapping = self.mapping
+		if(mapping.usesGestures):
+			mapping.update(currentState.buttons | self.gestures.detect(currentState.gx, currentState.gy, currentState.gz, t), t)
+		else:
+			mapping.update(currentState.buttons, t)
+
+		# laserpointer mode - show dot on screen at absolute screen coordinates
+		if(self.laserPointerHolds):
+			self.__updateLaserPointer()
+		if(self.scrollHolds):
+			self.__updateTiltScroll(t)
+		# Nunchuk/Classic Controller stick (in passthrough mode only every other report has its data)
+		if(self.usesStick and not currentState.motionPlusData):
+			self.__updateStick(currentState, t)
+
+		# whiteboard mode - move mouse
+		if(tracks):
+			pen = tracks[0]
+			if(self.operationMode == ControllerOperationMode.DRAWING
+			and self.warpMatrix.computed and self.multiTouch and self.output.multiTouch):
+				if(stats): t0 = clock()
+				# translate coordinates of all blobs at once
+				points = self.warpMatrix.warpMany([(track.x, track.y) for track in tracks])
+				if(stats): t1 = clock(); stats.add('warp', t1 - t0)
+				# apply smoothing per blob and send all touch contacts
+				filters = self.touchFilters
+				contacts = []
+				for track, (x, y) in zip(tracks, points):
+					f = filters.get(track.id)
+					if(f is None): f = filters[track.id] = createFilter(self.filterConfig)
+					x, y = f.filter(x, y, t)
+					contacts.append((track.id, min(self.screenWidth-2, max(0, x)), min(self.screenHeight-2, max(0, y))))
+				if(len(filters) > len(tracks)):
+					self.touchFilters = {track.id: filters[track.id] for track in tracks}
+				if(stats): t0 = clock(); stats.add('smooth', t0 - t1)
+				self.output.touch(contacts)
+				self.mouseState.pressed = True
+				self.output.sync()
+				if(stats): stats.add('inject', clock() - t0)
+
+			elif(self.operationMode == ControllerOperationMode.DRAWING
+			and self.warpMatrix.computed):
+				if(self.mouseState.pressed and pen.id != self.mouseState.trackId):
+					# the pen vanished while another blob stays visible: end the stroke instead of
+					# drawing a line to the other blob
+					self.output.mouseUp()
 					self.mouseState.pressed = False
+					self.filter.reset()
+				self.mouseState.trackId = pen.id
+				if(stats): t0 = clock()
+				# translate coordinates
+				x, y = self.warpMatrix.warp(pen.x, pen.y)
+				if(stats): t1 = clock(); stats.add('warp', t1 - t0)
+				# apply smoothing and move mouse
+				self.mouseState.x, self.mouseState.y = self.filter.filter(x, y, t)
+				if(stats): t0 = clock(); stats.add('smooth', t0 - t1)
+				self.output.moveTo(
+					min(self.screenWidth-2, max(0, self.mouseState.x)),
+					min(self.screenHeight-2, max(0, self.mouseState.y))
+				)
+				if(not self.mouseState.pressed):
+					self.output.mouseDown()
+					self.mouseState.pressed = True
+				self.output.sync()
+				if(stats): stats.add('inject', clock() - t0)
+
+			elif(self.operationMode == ControllerOperationMode.CALIBRATION
+			and pen.age == 0):
+				if(len(self.calibrationPoints) < self.calibrationPointCount()):
+					self.calibrationPoints.append([pen.x, pen.y])
+					print('Calibration point {}: {},{}'.format(len(self.calibrationPoints), pen.x, pen.y))
+					self.evtCalibrationChanged.emit(len(self.calibrationPoints))
+				if(len(self.calibrationPoints) == self.calibrationPointCount()):
+					self.warpMatrix.setSourcePoints(self.calibrationPoints)
+					try:
+						self.warpMatrix.computeWarp()
+						self.__saveConfig(self.calibrationPoints)
+						self.operationMode = ControllerOperationMode.DRAWING
+						print('Calibration done (residual error {:.2f}), switch to operation mode'.format(self.warpMatrix.residual))
+					except ValueError as e:
+						# invalid calibration data (e.g. points too close) - start over
+						print('Calibration failed:', e)
+						self.calibrationPoints.clear()
+						self.evtCalibrationChanged.emit(len(self.calibrationPoints))
+
+		else: # mouse up
+			self.filter.reset()
+			self.mouseState.x = None
+			self.mouseState.y = None
+			self.mouseState.trackId = None
+			if(self.mouseState.pressed):
+				if(self.touchFilters):
+					self.output.touch([])
+					self.touchFilters = {}
+				else:
+					self.output.mouseUp()
+				self.mouseState.pressed = False
+
+		# flush all pointer events of this report at once
+		self.output.sync()
+		if(stats): stats.add('dispatch', clock() - dispatchStart)
+		return currentState
+
+
+class ControllerManager:
+	MAX_CONTROLLERS = len(PLAYER_LEDS)
+
+	evtControllerConnected = None
+	evtControllerDisconnected = None
+	evtStatusReport = None
+	evtLaserPointer = None
+	evtCalibrationChanged = None
+
+	def __init__(self):
+		self.evtControllerConnected = Signal()
+		self.evtControllerDisconnected = Signal()
+		self.evtStatusReport = Signal()
+		self.evtLaserPointer = Signal()
+		self.evtCalibrationChanged = Signal()
+
+		# running and disconnected controllers; disconnected ones are kept for a reconnect
+		self.controllers = []
+		self.operationMode = ControllerOperationMode.OFF
+		# start() is called from the UI and from the hotplug watcher thread
+		self.lock = threading.RLock()
+		self.hotplug = None
+		self.screenWidth = None
+		self.screenHeight = None
+		self.screenName = None
+
+	def runningControllers(self, exceptPlayer=None):
+		# exceptPlayer: e.g. the player index of a disconnect event, emitted while its thread still runs
+		return [c for c in self.controllers if c.isRunning() and c.playerIndex != exceptPlayer]
+
+	def getStats(self):
+		return [(c.playerIndex, c.getStats()) for c in self.controllers if c.stats]
+
+	def calibrationGrid(self):
+		if(not self.controllers): return 2
+		return self.controllers[0].calibrationGrid
+
+	def enumerate(self):
+		# returns (path, serial) of all connected remotes
+		import hid
+		devices = []
+		for id in IDs:
+			for d in hid.enumerate(id['vid'], id['pid']):
+				if(d['path'] not in [path for path, serial in devices]):
+					devices.append((d['path'], d.get('serial_number')))
+		return devices
+
+	def start(self, screenWidth, screenHeight, screenName=None):
+		# every remote gets its own controller with its own reader thread,
+		# so a slow or disconnected remote does not stall the others
+		# screenName: selects the calibration profiles (see Controller.screenName)
+		# returns the number of newly started controllers
+		with self.lock:
+			self.screenWidth = screenWidth
+			self.screenHeight = screenHeight
+			self.screenName = screenName
+			started = 0
+			usedPaths = [c.path for c in self.runningControllers()]
+			for path, serial in self.enumerate():
+				if(path in usedPaths): continue
+				controller = self.__reconnectController(path, serial) or self.__newController(path)
+				if(not controller): break
+				# keep mouse control switched off if the user disabled it before the disconnect
+				previousMode = self.operationMode if controller in self.controllers else None
+				controller.screenName = screenName
+				try:
+					controller.start(screenWidth, screenHeight)
+				except Exception as e:
+					print(f'Unable to start controller for {path}: {e}')
+					continue
+				if(previousMode == ControllerOperationMode.OFF):
+					controller.operationMode = previousMode
+				if(controller not in self.controllers):
+					self.controllers.append(controller)
+				started += 1
+			running = self.runningControllers()
+			if(not running):
+				raise Exception('Unable to find a Wiimote HID device')
+			self.controllers.sort(key=lambda c: c.playerIndex)
+
+			# LEDs show the player number as soon as more than one remote is connected
+			for controller in running:
+				controller.ledFeedback = (len(running) == 1)
+				if(not controller.ledFeedback):
+					controller.setPlayerLeds()
+			self.operationMode = running[0].operationMode
+			return started
+
+	def __reconnectController(self, path, serial):
+		# a remote which was connected before gets its controller back,
+		# including player number, calibration and settings
+		for controller in self.controllers:
+			if(not controller.isRunning() and serial and controller.serial == serial):
+				controller.path = path
+				return controller
+		return None
+
+	def __newController(self, path):
+		# prefer player numbers which are not reserved for a disconnected remote
+		usedIndices = [c.playerIndex for c in self.controllers]
+		runningIndices = [c.playerIndex for c in self.runningControllers()]
+		freeIndices = [i for i in range(self.MAX_CONTROLLERS) if i not in usedIndices]
+		freeIndices += [i for i in range(self.MAX_CONTROLLERS) if i in usedIndices and i not in runningIndices]
+		if(not freeIndices): return None
+		# forget the disconnected remote which blocks the player number
+		self.controllers = [c for c in self.controllers if c.isRunning() or c.playerIndex != freeIndices[0]]
+		controller = Controller(path, freeIndices[0])
+		controller.evtControllerDisconnected = self.evtControllerDisconnected
+		controller.evtStatusReport = self.evtStatusReport
+		controller.evtLaserPointer = self.evtLaserPointer
+		controller.evtCalibrationChanged = self.evtCalibrationChanged
+		return controller
+
+	def enableHotplug(self):
+		# reconnect remotes automatically as soon as their hidraw device appears
+		# (udev events via pyudev if installed, otherwise inotify on /dev; no polling)
+		if(self.hotplug): return True
+		from hotplug import HotplugWatcher
+		try:
+			self.hotplug = HotplugWatcher(self.__onDeviceAdded)
+		except OSError as e:
+			print('Hotplug not available:', e)
+			return False
+		return True
+
+	def __onDeviceAdded(self):
+		if(self.screenWidth is None): return
+		try:
+			started = self.start(self.screenWidth, self.screenHeight, self.screenName)
+		except Exception as e:
+			# not a Wiimote, or not accessible yet (udev may still change the permissions)
+			return
+		if(started):
+			self.evtControllerConnected.emit(len(self.runningControllers()))
+
+	def setOperationMode(self, operationMode):
+		self.operationMode = operationMode
+		for controller in self.runningControllers():
+			controller.operationMode = operationMode
 
-			previousState = currentState
+	def startCalibration(self):
+		for controller in self.runningControllers():
+			controller.startCalibration()
+		self.operationMode = ControllerOperationMode.CALIBRATION
@@ -40,7 +40,7 @@ class SystemTrayIcon(QSystemTrayIcon):
 		QCoreApplication.exit()
 
 class LaserPointerDot(QMainWindow):
-	position = [0, 0]
+	SIZE = 23
 
 	def __init__(self):
 		super(LaserPointerDot, self).__init__()
@@ -50,8 +50,12 @@ class LaserPointerDot(QMainWindow):
 			| Qt.CustomizeWindowHint | Qt.Tool # no taskbar entry
 		)
 		self.setAttribute(Qt.WA_TranslucentBackground)
-		self.resize(23, 23)
+		self.resize(self.SIZE, self.SIZE)
 		self.setWindowTitle('')
+		# the window is moved at most once per frame of the screen, to the latest position
+		self.target = None
+		self.moveTimer = QTimer(self)
+		self.moveTimer.timeout.connect(self.applyTarget)
 
 	def paintEvent(self, event):
 		painter = QPainter(self)
@@ -59,10 +63,25 @@ class LaserPointerDot(QMainWindow):
 		painter.setBrush(QBrush(Qt.red, Qt.SolidPattern))
 		painter.drawEllipse(2, 2, 20, 20)
 
-	def moveRel(self, x, y):
-		self.position[0] += x
-		self.position[1] += y
-		self.move(self.position[0], self.position[1])
+	def moveToScreen(self, screen, x, y):
+		# x, y: center of the dot in screen coordinates
+		geometry = screen.geometry()
+		self.target = (geometry.x() + x - self.SIZE // 2, geometry.y() + y - self.SIZE // 2)
+		if(not self.moveTimer.isActive()):
+			self.applyTarget()
+			self.moveTimer.start(max(1, int(1000 / (screen.refreshRate() or 60))))
+
+	def applyTarget(self):
+		if(self.target is None):
+			# no new position during the last frame, so the next one is applied immediately
+			self.moveTimer.stop()
+			return
+		self.move(self.target[0], self.target[1])
+		self.target = None
+
+	def hideEvent(self, event):
+		self.moveTimer.stop()
+		self.target = None
 
 class CalibrationWindow(QDialog):
 	DOT_SIZE = 10
@@ -73,38 +92,26 @@ class CalibrationWindow(QDialog):
 		self.setWindowState(Qt.WindowFullScreen)
 		self.setWindowTitle('Calibration Board')
 		self.points = 0
+		self.grid = 2
 		self.parentWidgetReference = None
 
 	def paintEvent(self, event):
-		marginHorizontal = int(self.width() * wiimote.Controller.CALIBRATION_MARGIN)
-		marginVertical = int(self.height() * wiimote.Controller.CALIBRATION_MARGIN)
+		targets = wiimote.calibrationTargets(
+			self.width(), self.height(), self.grid, wiimote.Controller.CALIBRATION_MARGIN
+		)
+		if(self.points >= len(targets)): return
 
 		painter = QPainter(self)
 		painter.setPen(QPen(Qt.red, 2, Qt.SolidLine))
-		if(self.points == 0):
-			painter.drawEllipse(
-				marginHorizontal, marginVertical,
-				self.DOT_SIZE, self.DOT_SIZE
-			)
-		elif(self.points == 1):
-			painter.drawEllipse(
-				self.width()-self.DOT_SIZE-marginHorizontal, marginVertical,
-				self.DOT_SIZE, self.DOT_SIZE
-			)
-		elif(self.points == 2):
-			painter.drawEllipse(
-				marginHorizontal, self.height()-self.DOT_SIZE-marginVertical,
-				self.DOT_SIZE, self.DOT_SIZE
-			)
-		elif(self.points == 3):
-			painter.drawEllipse(
-				self.width()-self.DOT_SIZE-marginHorizontal, self.height()-self.DOT_SIZE-marginVertical,
-				self.DOT_SIZE, self.DOT_SIZE
-			)
+		x, y = targets[self.points]
+		painter.drawEllipse(
+			int(x - self.DOT_SIZE/2), int(y - self.DOT_SIZE/2),
+			self.DOT_SIZE, self.DOT_SIZE
+		)
 
 	def drawPoint(self, points):
 		self.points = points
-		if(self.points > 3):
+		if(self.points >= self.grid * self.grid):
 			self.hide()
 			if(self.parentWidgetReference):
 				self.parentWidgetReference.show()
@@ -112,7 +119,8 @@ class CalibrationWindow(QDialog):
 			self.repaint()
 
 class ControlWindow(QMainWindow):
-	evtControllerDisconnected = pyqtSignal()
+	evtControllerConnected = pyqtSignal(int)
+	evtControllerDisconnected = pyqtSignal(int)
 	evtStatusReport = pyqtSignal(int)
 	evtLaserPointer = pyqtSignal(bool, int, int)
 	evtCalibrationChanged = pyqtSignal(int)
@@ -127,6 +135,7 @@ class ControlWindow(QMainWindow):
 		self.calibrationWindow = CalibrationWindow()
 
 		# connect events
+		self.evtControllerConnected.connect(self.evtControllerConnectedHandler)
 		self.evtControllerDisconnected.connect(self.evtControllerDisconnectedHandler)
 		self.evtStatusReport.connect(self.evtStatusReportHandler)
 		self.evtLaserPointer.connect(self.evtLaserPointerHandler)
@@ -162,6 +171,14 @@ class ControlWindow(QMainWindow):
 		self.lblStatus = QLabel('Initializing...')
 		self.mainLayout.addWidget(self.lblStatus, 2, 0, 1, 3)
 
+		# performance stats panel, only visible if enabled in config ([general] stats = yes)
+		self.lblStats = QLabel()
+		self.lblStats.setWordWrap(True)
+		self.lblStats.setVisible(False)
+		self.mainLayout.addWidget(self.lblStats, 3, 0, 1, 4)
+		self.statsTimer = QTimer(self)
+		self.statsTimer.timeout.connect(self.updateStats)
+
 		centralWidget = QWidget()
 		centralWidget.setLayout(self.mainLayout)
 		self.setCentralWidget(centralWidget)
@@ -174,23 +191,26 @@ class ControlWindow(QMainWindow):
 		self.trayIcon = SystemTrayIcon(self.icon, self)
 		self.trayIcon.show()
 
-		# start controller
-		self.wiimoteController = wiimote.Controller()
+		# start controllers (one per connected Wiimote)
+		self.wiimoteController = wiimote.ControllerManager()
+		self.wiimoteController.evtControllerConnected = self.evtControllerConnected
 		self.wiimoteController.evtControllerDisconnected = self.evtControllerDisconnected
 		self.wiimoteController.evtStatusReport = self.evtStatusReport
 		self.wiimoteController.evtLaserPointer = self.evtLaserPointer
 		self.wiimoteController.evtCalibrationChanged = self.evtCalibrationChanged
 		self.tryInitController(False)
+		# reconnect automatically when a remote is paired again (the connect button stays as fallback)
+		self.wiimoteController.enableHotplug()
 
 	def tryInitController(self, reportError=True):
 		try:
 			targetScreen = QApplication.instance().screens()[self.sltScreen.currentIndex()]
 			self.wiimoteController.start(
 				targetScreen.geometry().width(),
-				targetScreen.geometry().height()
+				targetScreen.geometry().height(),
+				self.sltScreen.currentText()
 			)
-			self.lblStatus.setText('Wiimote connected.')
-			self.setActiveboardEnabled(True)
+			self.evtControllerConnectedHandler(len(self.wiimoteController.runningControllers()))
 		except Exception as e:
 			print(traceback.format_exc())
 			if(reportError):
@@ -198,6 +218,12 @@ class ControlWindow(QMainWindow):
 			self.lblStatus.setText(str(e))
 			self.setActiveboardEnabled(False)
 
+	def updateStats(self):
+		self.lblStats.setText('\n'.join([
+			'Player '+str(index+1)+': '+wiimote.formatStats(stats)
+			for index, stats in self.wiimoteController.getStats()
+		]))
+
 	def setActiveboardEnabled(self, state):
 		if(state):
 			self.trayIcon.setIcon(self.icon)
@@ -217,17 +243,30 @@ class ControlWindow(QMainWindow):
 		msg.setStandardButtons(QMessageBox.Ok)
 		msg.exec()
 
-	def evtControllerDisconnectedHandler(self):
-		self.lblStatus.setText('Wiimote disconnected!')
-		self.setActiveboardEnabled(False)
+	def evtControllerConnectedHandler(self, count):
+		self.lblStatus.setText('Wiimote connected.' if count == 1 else str(count)+' Wiimotes connected.')
+		self.setActiveboardEnabled(True)
+		if(self.wiimoteController.getStats()):
+			self.lblStats.setVisible(True)
+			self.statsTimer.start(1000)
+
+	def evtControllerDisconnectedHandler(self, player):
+		# the other remotes keep working
+		running = len(self.wiimoteController.runningControllers(player))
+		if(running):
+			self.lblStatus.setText('Wiimote '+str(player+1)+' disconnected, '+str(running)+' still connected.')
+		else:
+			self.lblStatus.setText('Wiimote disconnected!')
+			self.setActiveboardEnabled(False)
 
 	def evtStatusReportHandler(self, batteryLevel):
 		self.lblStatus.setText('Wiimote connected (battery '+str(batteryLevel)+'%)')
 
 	def evtLaserPointerHandler(self, visible, x, y):
 		if(visible):
+			targetScreen = QApplication.instance().screens()[self.sltScreen.currentIndex()]
+			self.laserPointerDot.moveToScreen(targetScreen, x, y)
 			self.laserPointerDot.show()
-			self.laserPointerDot.moveRel(x, y)
 		else:
 			self.laserPointerDot.hide()
 
@@ -238,6 +277,7 @@ class ControlWindow(QMainWindow):
 		self.hide()
 		self.parentWidgetReference = self
 		targetScreen = QApplication.instance().screens()[self.sltScreen.currentIndex()]
+		self.calibrationWindow.grid = self.wiimoteController.calibrationGrid()
 		self.calibrationWindow.resize(20, 20)
 		self.calibrationWindow.move(targetScreen.geometry().x(), targetScreen.geometry().y())
 		time.sleep(0.1)
@@ -249,15 +289,14 @@ class ControlWindow(QMainWindow):
 		self.tryInitController()
 
 	def onClickCalibrate(self, e):
-		self.wiimoteController.operationMode = wiimote.ControllerOperationMode.CALIBRATION
-		self.wiimoteController.calibrationPoints.clear()
+		self.wiimoteController.startCalibration()
 		self.showCalibrationWindow()
 
 	def onClickMouseControl(self, e):
 		if(self.btnMouseControl.isChecked()):
-			self.wiimoteController.operationMode = wiimote.ControllerOperationMode.DRAWING
+			self.wiimoteController.setOperationMode(wiimote.ControllerOperationMode.DRAWING)
 		else:
-			self.wiimoteController.operationMode = wiimote.ControllerOperationMode.OFF
+			self.wiimoteController.setOperationMode(wiimote.ControllerOperationMode.OFF)
 
 	def onClickDraw(self, e):
 		self.showDialog('Wiimote4Linux', 'Coming soon!', '(maybe)', QMessageBox.Information)
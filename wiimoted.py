@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# *-* coding: utf-8 *-*
+
+# headless Wiimote4Linux (whiteboard, presenter and volume control) without GUI,
+# e.g. for kiosk machines or as systemd service; PyQt5 is never imported
+
+import argparse
+import signal
+import sys
+import threading
+
+import wiimote
+from config import configStore
+
+
+def parseScreen(value):
+	width, _, height = value.lower().partition('x')
+	return int(width), int(height)
+
+def main():
+	parser = argparse.ArgumentParser(description='Wiimote4Linux headless daemon')
+	parser.add_argument('--screen', help='screen size WIDTHxHEIGHT (default: [general] screen in config file, or 1920x1080)')
+	parser.add_argument('--calibrate', action='store_true', help='start calibration after connecting (IR points from top left to bottom right, row by row)')
+	parser.add_argument('--stats', type=int, metavar='SECONDS', help='print performance stats every n seconds')
+	parser.add_argument('--no-hotplug', action='store_true', help='exit when all remotes are disconnected instead of waiting for a reconnect')
+	args = parser.parse_args()
+
+	screen = args.screen
+	if(not screen):
+		config = configStore(wiimote.Controller().configPath).load()
+		screen = config.get('general', 'screen', fallback='1920x1080')
+	screenWidth, screenHeight = parseScreen(screen)
+
+	manager = wiimote.ControllerManager()
+	stopped = threading.Event()
+	hotplug = not args.no_hotplug and manager.enableHotplug()
+	def onConnect(count):
+		print(f'Wiimote connected ({count} total)')
+		enableStats()
+	def onDisconnect(player):
+		print(f'Wiimote {player+1} disconnected')
+		if(not hotplug and not manager.runningControllers(player)):
+			stopped.set()
+	def enableStats():
+		for controller in manager.controllers:
+			if(args.stats and not controller.stats):
+				controller.enableStats(args.stats)
+	manager.evtControllerConnected.connect(onConnect)
+	manager.evtControllerDisconnected.connect(onDisconnect)
+	manager.evtStatusReport.connect(lambda battery: print(f'Battery: {battery}%'))
+	manager.evtCalibrationChanged.connect(lambda points: print(f'Calibration: {points} of {manager.calibrationGrid()**2} points'))
+
+	try:
+		manager.start(screenWidth, screenHeight)
+	except Exception as e:
+		print(e, file=sys.stderr)
+		if(not hotplug):
+			return 1
+		# remember the screen size for the hotplug watcher and wait for a remote
+		manager.screenWidth, manager.screenHeight = screenWidth, screenHeight
+		print('Waiting for a Wiimote...')
+	enableStats()
+	if(args.calibrate):
+		manager.startCalibration()
+
+	signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+	try:
+		stopped.wait()
+	except KeyboardInterrupt:
+		return 0
+	# exit code != 0 after a disconnect, so that systemd (Restart=on-failure) can restart us
+	return 1 if not hotplug and not manager.runningControllers() else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())